@@ -1,10 +1,19 @@
 import os
-from fastapi import APIRouter, HTTPException
-from typing import List
+import re
+import asyncio
+import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from pydantic import BaseModel
+from core.log_files import is_compressed, log_size, read_lines_after, read_lines_before, read_log_text
+from core.log_index import LogIndex, in_date_range
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
+# Seconds between checks for new lines of a followed log
+FOLLOW_POLL_INTERVAL = 1.0
+
 
 class LogFile(BaseModel):
     name: str
@@ -13,9 +22,30 @@ class LogFile(BaseModel):
     modified: float
 
 
+class LogSearchHit(BaseModel):
+    task: str
+    name: str
+    test_mode: bool
+    line_number: int
+    line: str
+    modified: float
+
+
+class LogSearchResult(BaseModel):
+    hits: List[LogSearchHit]
+    files_searched: int
+    # True if the search stopped at the limit
+    truncated: bool
+
+
 class LogContent(BaseModel):
     content: str
     name: str
+    # Byte offsets of the content within the file, for paging back and following
+    # (within the uncompressed text of a gzipped log, as is size)
+    start: int = 0
+    end: int = 0
+    size: int = 0
 
 
 def get_log_dirs() -> dict:
@@ -30,8 +60,13 @@ def get_log_dirs() -> dict:
     return log_dirs
 
 
-@router.get("/{task_name}", response_model=List[LogFile])
-def list_log_files(task_name: str, test_mode: bool = False):
+def get_log_index() -> LogIndex:
+    from main import log_index
+    return log_index
+
+
+def get_log_path(task_name: str, filename: str, test_mode: bool) -> str:
+    """Resolve a log file of a task, rejecting names that point outside its log directory."""
     log_dirs = get_log_dirs()
     if task_name not in log_dirs:
         raise HTTPException(status_code=404, detail=f"Task '{task_name}' not found")
@@ -39,27 +74,72 @@ def list_log_files(task_name: str, test_mode: bool = False):
     dirs = log_dirs[task_name]
     log_dir = dirs.get("test_log_dir") if test_mode else dirs.get("log_dir")
 
-    if not log_dir or not os.path.exists(log_dir):
-        return []
+    if not log_dir:
+        raise HTTPException(status_code=404, detail="Log directory not configured")
+
+    if os.path.basename(filename) != filename or filename in ('.', '..'):
+        raise HTTPException(status_code=400, detail="Invalid file path")
 
-    files = []
-    for filename in os.listdir(log_dir):
-        if filename.endswith('.log'):
-            filepath = os.path.join(log_dir, filename)
-            stat = os.stat(filepath)
-            files.append(LogFile(
-                name=filename,
-                path=filepath,
-                size=stat.st_size,
-                modified=stat.st_mtime
-            ))
+    filepath = os.path.join(log_dir, filename)
 
-    files.sort(key=lambda f: f.modified, reverse=True)
-    return files
+    if not os.path.isfile(filepath):
+        raise HTTPException(status_code=404, detail=f"Log file '{filename}' not found")
 
+    return filepath
+
+
+@router.get("/search", response_model=LogSearchResult)
+def search_log_files(
+    q: str,
+    task: Optional[List[str]] = Query(None),
+    test_mode: bool = False,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    limit: int = Query(200, ge=1, le=2000),
+    log_index: LogIndex = Depends(get_log_index)
+):
+    """
+    Search the logs of every task (or only ``task``) for lines containing
+    ``q`` (a regular expression with ``regex``), newest logs first. Only
+    logs of runs between ``since`` and ``until`` (inclusive) are opened.
+    """
+    try:
+        pattern = re.compile(q if regex else re.escape(q), 0 if case_sensitive else re.IGNORECASE)
+    except re.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid regular expression: {e}")
 
-@router.get("/{task_name}/{filename}", response_model=LogContent)
-def read_log_file(task_name: str, filename: str, test_mode: bool = False, tail: int = 500):
+    log_dirs = get_log_dirs()
+    unknown = [name for name in task or [] if name not in log_dirs]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Task '{unknown[0]}' not found")
+
+    # Tasks may share a log directory; a log belongs to the task in its file name
+    owners = {}
+    for task_name in task or log_dirs:
+        log_dir = log_dirs[task_name].get("test_log_dir") if test_mode else log_dirs[task_name].get("log_dir")
+        if not log_dir:
+            continue
+        for entry in log_index.files(log_dir):
+            if task and entry.task in log_dirs and entry.task != task_name:
+                continue
+            if in_date_range(entry, since, until):
+                owners.setdefault(entry.path, (entry, entry.task if entry.task in log_dirs else task_name))
+
+    entries = sorted((entry for entry, _ in owners.values()), key=lambda e: e.modified, reverse=True)
+    hits, searched, truncated = log_index.search(entries, pattern, limit)
+    return LogSearchResult(
+        hits=[LogSearchHit(task=owners[entry.path][1], name=entry.name, test_mode=test_mode,
+                           line_number=line_number, line=line, modified=entry.modified)
+              for entry, line_number, line in hits],
+        files_searched=searched,
+        truncated=truncated
+    )
+
+
+@router.get("/{task_name}", response_model=List[LogFile])
+def list_log_files(task_name: str, test_mode: bool = False, log_index: LogIndex = Depends(get_log_index)):
     log_dirs = get_log_dirs()
     if task_name not in log_dirs:
         raise HTTPException(status_code=404, detail=f"Task '{task_name}' not found")
@@ -68,18 +148,81 @@ def read_log_file(task_name: str, filename: str, test_mode: bool = False, tail:
     log_dir = dirs.get("test_log_dir") if test_mode else dirs.get("log_dir")
 
     if not log_dir:
-        raise HTTPException(status_code=404, detail="Log directory not configured")
-
-    filepath = os.path.join(log_dir, filename)
-
-    if not os.path.exists(filepath):
-        raise HTTPException(status_code=404, detail=f"Log file '{filename}' not found")
+        return []
 
-    if not filepath.startswith(log_dir):
-        raise HTTPException(status_code=400, detail="Invalid file path")
+    return [LogFile(name=entry.name, path=entry.path, size=entry.size, modified=entry.modified)
+            for entry in log_index.files(log_dir)]
 
-    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-        lines = f.readlines()
-        content = ''.join(lines[-tail:]) if tail else ''.join(lines)
 
-    return LogContent(content=content, name=filename)
+@router.get("/{task_name}/{filename}", response_model=LogContent)
+def read_log_file(
+    task_name: str,
+    filename: str,
+    test_mode: bool = False,
+    tail: int = Query(500, ge=0),
+    before: Optional[int] = Query(None, ge=0)
+):
+    """
+    The last ``tail`` lines of a log (the whole log if 0). With ``before``,
+    a byte offset such as a previous response's ``start``, the lines ending
+    there instead, for paging back through the log. Gzipped logs are
+    decompressed, and their offsets refer to the uncompressed text.
+    """
+    filepath = get_log_path(task_name, filename, test_mode)
+
+    if tail:
+        content, start, end = read_lines_before(filepath, before, tail)
+    else:
+        content, end = read_log_text(filepath, before)
+        start = 0
+
+    return LogContent(content=content, name=filename, start=start, end=end, size=log_size(filepath))
+
+
+@router.get("/{task_name}/{filename}/follow")
+async def follow_log_file(
+    request: Request,
+    task_name: str,
+    filename: str,
+    test_mode: bool = False,
+    offset: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-sent events stream of the lines appended to a log from byte
+    ``offset`` (a previous response's ``end``; default the current end of
+    the file). Each "log" event carries a chunk of whole lines and has the
+    offset after them as its id, so a reconnecting client resumes there.
+    """
+    filepath = get_log_path(task_name, filename, test_mode)
+    if is_compressed(filepath):
+        raise HTTPException(status_code=400, detail="Compressed logs are no longer written to")
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    if offset is None:
+        offset = os.path.getsize(filepath)
+
+    async def stream():
+        position = offset
+        idle = 0.0
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            try:
+                text, position = await asyncio.to_thread(read_lines_after, filepath, position)
+            except FileNotFoundError:
+                yield "event: gone\ndata: \n\n"
+                return
+            if text:
+                idle = 0.0
+                data = ''.join(f"data: {line}\n" for line in text.splitlines())
+                yield f"event: log\nid: {position}\n{data}\n"
+                continue
+            idle += FOLLOW_POLL_INTERVAL
+            if idle >= 15:
+                # Comment line keeping proxies from closing an idle stream
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(FOLLOW_POLL_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,12 +1,23 @@
 import os
+import json
+import asyncio
 import logging
 import datetime
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
-from typing import List
+import httpx
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from models.job import Job, JobCreate, JobStatus
 from core.config_manager import ConfigManager
 from core.job_manager import JobManager
-from core.alma_fetcher import AlmaFetcher
+from core.job_queue import DuplicateJobError, JobQueue, QueueFullError
+from core.job_events import JobEventBroker
+from core.async_alma_fetcher import AsyncAlmaFetcher
+from core.rate_governor import RateGovernor
+from core.retry import RetryPolicy
+from core.checkpoint import Checkpoint
+from core.cancellation import JobCancelled
+from core.log_files import apply_log_retention
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -21,31 +32,67 @@ def get_job_manager() -> JobManager:
     return job_manager
 
 
-def setup_logging(log_dir: str):
+def get_job_queue() -> JobQueue:
+    from main import job_queue
+    return job_queue
+
+
+def get_job_events() -> JobEventBroker:
+    from main import job_events
+    return job_events
+
+
+def get_http_client() -> httpx.AsyncClient:
+    from main import http_client
+    return http_client
+
+
+def get_rate_governor() -> RateGovernor:
+    from main import rate_governor
+    return rate_governor
+
+
+def setup_logging(log_dir: Optional[str], task_name: str, test_mode: bool) -> logging.Logger:
+    """
+    Create the logger for a job. Several jobs run at once on the event loop,
+    so each gets its own logger and log file instead of sharing the root
+    logger's handlers. The logger is keyed by task and mode, which the job
+    queue never runs twice at once, so loggers aren't created per job.
+    """
+    logger = logging.getLogger(f"alma_reports.job.{task_name}.{'test' if test_mode else 'production'}")
+    logger.setLevel(logging.DEBUG)
+    # Without a log file the job's lines go to the console through the root logger
+    logger.propagate = not log_dir
+    if not log_dir:
+        return logger
+
     os.makedirs(log_dir, exist_ok=True)
     log_filename = os.path.join(
         log_dir,
-        f"download_analytics_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        f"download_analytics_log_{task_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
     )
+    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(file_handler)
+    return logger
 
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
 
-    logging.basicConfig(
-        filename=log_filename,
-        level=logging.DEBUG,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
-    return log_filename
+def close_logging(logger: logging.Logger):
+    for handler in logger.handlers[:]:
+        handler.close()
+        logger.removeHandler(handler)
 
 
-def run_report_task(
+async def run_report_task(
     job_id: str,
+    task_name: str,
     task_config: dict,
     test_mode: bool,
-    job_manager: JobManager
+    job_manager: JobManager,
+    http_client: httpx.AsyncClient
 ):
-    job_manager.update_job_status(job_id, JobStatus.RUNNING)
+    from main import (schema_cache, rate_governor, output_hash_store,
+                      watermark_store, MAX_RETRIES, RETRY_BACKOFF, CHECKPOINT_DIR)
 
     api_key = os.getenv('ALMA_PROD_API_KEY')
     if not api_key:
@@ -53,51 +100,129 @@ def run_report_task(
         return
 
     log_dir = task_config.get('TEST_LOG_DIR') if test_mode else task_config.get('LOG_DIR')
-    if log_dir:
-        setup_logging(log_dir)
+    # Used until the job's own logger is set up, e.g. if its log directory can't be created
+    logger = logging.getLogger(__name__)
+    job_logger = None
 
     try:
-        fetcher = AlmaFetcher(api_key)
+        logger = job_logger = setup_logging(log_dir, task_name, test_mode)
+        if log_dir:
+            # Off the event loop, since gzipping a large log takes a while
+            await asyncio.to_thread(
+                apply_log_retention, log_dir, task_name,
+                task_config.get('LOG_COMPRESS_AFTER_DAYS'), task_config.get('LOG_DELETE_AFTER_DAYS'), logger
+            )
+        fetcher = AsyncAlmaFetcher(
+            api_key,
+            http_client,
+            schema_cache=schema_cache,
+            logger=logger,
+            retry=RetryPolicy(MAX_RETRIES, RETRY_BACKOFF),
+            hash_store=output_hash_store,
+            watermarks=watermark_store,
+            cancel_token=job_manager.get_cancel_token(job_id)
+        )
 
         def progress_callback(rows: int, message: str):
             job_manager.update_job_progress(job_id, rows, message)
 
-        output_file, row_count = fetcher.run_report(
+        checkpoint = None
+        if CHECKPOINT_DIR:
+            checkpoint = Checkpoint(CHECKPOINT_DIR, task_name, task_config['ALMA_REPORT_PATH'])
+
+        output_file, row_count = await fetcher.run_report(
             task_config,
             test_mode=test_mode,
-            progress_callback=progress_callback
+            progress_callback=progress_callback,
+            checkpoint=checkpoint
         )
+        logger.info(f"Rate governor: {rate_governor.stats()}")
         job_manager.complete_job(job_id, output_file, row_count)
+    except JobCancelled:
+        # cancel_job already recorded the status
+        logger.info("Report cancelled")
     except Exception as e:
-        logging.exception("Report execution failed")
+        logger.exception("Report execution failed")
         job_manager.fail_job(job_id, str(e))
+    finally:
+        if job_logger:
+            close_logging(job_logger)
 
 
 @router.post("/run", response_model=Job)
-def run_report(
+async def run_report(
     job_request: JobCreate,
-    background_tasks: BackgroundTasks,
     config_manager: ConfigManager = Depends(get_config_manager),
-    job_manager: JobManager = Depends(get_job_manager)
+    job_manager: JobManager = Depends(get_job_manager),
+    job_queue: JobQueue = Depends(get_job_queue),
+    http_client: httpx.AsyncClient = Depends(get_http_client)
 ):
     task_config = config_manager.get_raw_task_config(job_request.task_name)
     if not task_config:
         raise HTTPException(status_code=404, detail=f"Task '{job_request.task_name}' not found")
 
-    job = job_manager.create_job(job_request.task_name, job_request.test_mode)
-    background_tasks.add_task(
-        run_report_task,
-        job.id,
-        task_config,
-        job_request.test_mode,
-        job_manager
-    )
-    return job
+    async def run(job_id: str):
+        await run_report_task(job_id, job_request.task_name, task_config, job_request.test_mode,
+                              job_manager, http_client)
+
+    try:
+        return job_queue.submit(job_request.task_name, job_request.test_mode, run,
+                                priority=task_config.get('PRIORITY', 0))
+    except DuplicateJobError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.get("/jobs", response_model=List[Job])
-def list_jobs(limit: int = 50, job_manager: JobManager = Depends(get_job_manager)):
-    return job_manager.list_jobs(limit)
+def list_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+    task_name: Optional[str] = None,
+    status: Optional[JobStatus] = None,
+    job_manager: JobManager = Depends(get_job_manager)
+):
+    """Newest jobs first. Pass the id of the last job returned as ``before`` to get the next page."""
+    return job_manager.list_jobs(limit, before=before, task_name=task_name, status=status)
+
+
+@router.get("/jobs/events")
+async def stream_job_events(
+    request: Request,
+    job_id: Optional[str] = None,
+    job_manager: JobManager = Depends(get_job_manager),
+    job_events: JobEventBroker = Depends(get_job_events)
+):
+    """
+    Server-sent events stream of job changes ("job" events carrying the Job
+    as JSON), for every job or only ``job_id``. Active jobs are sent on
+    connect; after that, each changed job's latest state at most once per
+    ALMA_JOB_EVENT_INTERVAL.
+    """
+    subscription = job_events.subscribe(job_id)
+    if job_id:
+        job = job_manager.get_job(job_id)
+        initial = [job] if job else []
+    else:
+        initial = job_manager.active_jobs()
+    for job in initial:
+        subscription.push(job.model_dump(mode='json'))
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(timeout=15)
+                if not batch:
+                    # Comment line keeping proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                for job in batch:
+                    yield f"event: job\ndata: {json.dumps(job)}\n\n"
+        finally:
+            job_events.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.get("/jobs/{job_id}", response_model=Job)
@@ -108,6 +233,21 @@ def get_job(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
     return job
 
 
+@router.get("/http-pool")
+def get_http_pool_stats(http_client: httpx.AsyncClient = Depends(get_http_client)):
+    return http_client.pool_stats
+
+
+@router.get("/queue")
+def get_queue_stats(job_queue: JobQueue = Depends(get_job_queue)):
+    return job_queue.stats()
+
+
+@router.get("/rate-limit")
+def get_rate_limit_stats(rate_governor: RateGovernor = Depends(get_rate_governor)):
+    return rate_governor.stats()
+
+
 @router.post("/jobs/{job_id}/cancel")
 def cancel_job(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
     if not job_manager.cancel_job(job_id):
@@ -1,3 +0,0 @@
-from .config_manager import ConfigManager
-from .job_manager import JobManager
-from .alma_fetcher import AlmaFetcher
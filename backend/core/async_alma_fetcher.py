@@ -0,0 +1,334 @@
+import os
+import time
+import datetime
+import asyncio
+import logging
+import itertools
+import xml.etree.ElementTree as ET
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from urllib.parse import unquote
+import httpx
+from core.alma_fetcher import API_URL, make_row_parser, parse_column_types, parse_report_schema
+from core.cancellation import CancelToken, JobCancelled
+from core.schema_cache import SchemaCache
+from core.checkpoint import Checkpoint
+from core.writers import open_outputs, output_targets, read_output_headings
+from core.incremental import WatermarkStore, is_incremental, plan_incremental
+from core.output_hashes import OutputHashStore
+from core.rate_governor import RateGovernor
+from core.retry import AlmaAPIError, RetryPolicy
+
+T = TypeVar('T')
+
+
+def create_async_client(
+    pool_maxsize: int = 10,
+    timeout: float = 300.0,
+    governor: Optional[RateGovernor] = None
+) -> httpx.AsyncClient:
+    """
+    Create a non-blocking HTTP client with a keep-alive pool shared by all
+    reports. Request and new-connection counts are kept in ``client.pool_stats``.
+    If a governor is given, every request waits for it and every response is fed back to it.
+    """
+    stats = {'requests': 0, 'connections': 0}
+
+    async def trace(event_name: str, info: Dict):
+        if event_name == 'connection.connect_tcp.complete':
+            stats['connections'] += 1
+
+    async def before_request(request: httpx.Request):
+        if governor:
+            await governor.acquire_async()
+        stats['requests'] += 1
+        request.extensions['trace'] = trace
+
+    async def after_response(response: httpx.Response):
+        if governor:
+            governor.observe(response.status_code, response.headers)
+
+    client = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=pool_maxsize, max_connections=pool_maxsize),
+        timeout=timeout,
+        event_hooks={'request': [before_request], 'response': [after_response]}
+    )
+    client.pool_stats = stats
+    return client
+
+
+class AsyncAlmaFetcher:
+    """
+    Fetches reports for the backend. Page requests are awaited on the event
+    loop instead of holding a threadpool thread for the whole run; XML
+    parsing and file writes are handed to worker threads one page at a time,
+    and the next page is always requested while the current one is being
+    written.
+
+    With a ``cancel_token``, cancelling the job abandons the page request in
+    flight, stops before the next page and discards the partial output.
+    """
+    API_URL = API_URL
+
+    def __init__(
+        self,
+        api_key: str,
+        client: httpx.AsyncClient,
+        schema_cache: Optional[SchemaCache] = None,
+        logger: Optional[logging.Logger] = None,
+        retry: Optional[RetryPolicy] = None,
+        hash_store: Optional[OutputHashStore] = None,
+        watermarks: Optional[WatermarkStore] = None,
+        cancel_token: Optional[CancelToken] = None
+    ):
+        self.api_key = api_key
+        self.client = client
+        self.schema_cache = schema_cache
+        self.retry = retry or RetryPolicy()
+        self.hash_store = hash_store
+        self.watermarks = watermarks
+        self.cancel_token = cancel_token
+        self.logger = logger or logging.getLogger()
+        self.headers = {
+            "Authorization": f"apikey {api_key}",
+            "Accept": "application/json"
+        }
+
+    async def _cancellable(self, awaitable: Awaitable[T]) -> T:
+        if self.cancel_token is None:
+            return await awaitable
+        return await self.cancel_token.run(awaitable)
+
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    async def _request_page(self, params: Dict) -> Optional[ET.Element]:
+        """
+        Request one page and return its parsed result XML, or None if the page
+        is empty. Transient failures are retried per ``self.retry``; anything
+        else raises AlmaAPIError so a report is never written truncated.
+        """
+        self.logger.debug(f"fetch_rows Requesting: {self.API_URL}")
+        retry = self.retry
+
+        for attempt in range(retry.max_retries + 1):
+            retry.attempts += 1
+            started = time.monotonic()
+            try:
+                resp = await self._cancellable(self.client.get(self.API_URL, headers=self.headers, params=params))
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status_code == 200:
+                    xml_data = resp.json().get("anies", [None])[0]
+                    if not xml_data:
+                        return None
+                    return await asyncio.to_thread(ET.fromstring, xml_data)
+                error = f"HTTP {resp.status_code}: {resp.text[:500]}"
+                if resp.status_code not in RetryPolicy.RETRYABLE_STATUS:
+                    self.logger.error(f"Failed to fetch rows: {error}")
+                    raise AlmaAPIError(f"Failed to fetch rows: {error}", resp.status_code)
+            retry.retry_seconds += time.monotonic() - started
+
+            if attempt == retry.max_retries:
+                break
+            delay = retry.backoff(attempt + 1)
+            self.logger.warning(f"Page request failed ({error}); retry {attempt + 1}/{retry.max_retries} in {delay:.1f}s")
+            await self._cancellable(asyncio.sleep(delay))
+            retry.retries += 1
+            retry.retry_seconds += delay
+
+        self.logger.error(f"Failed to fetch rows after {retry.max_retries + 1} attempts: {error}")
+        raise AlmaAPIError(f"Failed to fetch rows after {retry.max_retries + 1} attempts: {error}")
+
+    async def _resume_checkpoint(self, params: Dict, checkpoint: Checkpoint) -> Optional[ET.Element]:
+        """
+        Request the page after a checkpoint's last saved page. Returns None,
+        and discards the checkpoint, if Alma rejects the saved token as expired.
+        """
+        try:
+            page = await self._request_page(dict(params, token=checkpoint.state['token']))
+        except AlmaAPIError as e:
+            # Running out of retries is not proof the token is bad; keep the checkpoint for the next run
+            if e.status_code is None:
+                raise
+            self.logger.warning(f"Checkpoint token was rejected, fetching the report from the start: {e}")
+            page = None
+        if page is None:
+            await asyncio.to_thread(checkpoint.clear)
+            return None
+        self.logger.info(f"Resuming from checkpoint after {checkpoint.state['rows']} rows")
+        return page
+
+    @staticmethod
+    def _replay_checkpoint(checkpoint: Checkpoint, writer, max_rows: Optional[int]) -> int:
+        """Write a checkpoint's spilled rows to the writer and return how many were written."""
+        rows = checkpoint.replay()
+        if max_rows:
+            rows = itertools.islice(rows, max_rows)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+
+    async def _start_fetch(
+        self,
+        report_path: str,
+        checkpoint: Optional[Checkpoint],
+        report_filter: Optional[str]
+    ) -> Tuple[Dict, ET.Element, Dict[str, str], Dict[str, str], bool]:
+        """
+        Get the first page to process, the column map and the xsd column
+        types, resuming from the checkpoint if it holds an earlier run.
+        Returns (params for the next pages, page, headers, column_types, resumed).
+        """
+        params = {"path": unquote(report_path), "limit": "1000"}
+        if report_filter:
+            params['filter'] = report_filter
+        root = None
+        if checkpoint is not None and await asyncio.to_thread(checkpoint.load, report_filter):
+            root = await self._resume_checkpoint(params, checkpoint)
+        if root is not None:
+            params['token'] = checkpoint.state['token']
+            return params, root, checkpoint.state['headers'], checkpoint.state.get('types', {}), True
+
+        root = await self._request_page(dict(params))
+
+        # The column map comes from the schema embedded in the first data page
+        headers = parse_report_schema(root) if root is not None else {}
+        column_types = parse_column_types(root) if root is not None else {}
+        if self.schema_cache:
+            if headers:
+                self.schema_cache.put(report_path, headers, column_types)
+            else:
+                headers = self.schema_cache.get(report_path) or {}
+                column_types = self.schema_cache.get_types(report_path)
+        if not headers:
+            raise ValueError("No headers found for report")
+        if checkpoint is not None:
+            await asyncio.to_thread(checkpoint.start, headers, report_filter, column_types)
+        return params, root, headers, column_types, False
+
+    async def run_report(
+        self,
+        config: Dict,
+        test_mode: bool = False,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        checkpoint: Optional[Checkpoint] = None
+    ) -> Tuple[str, int]:
+        report_path = config['ALMA_REPORT_PATH']
+
+        if test_mode:
+            output_path = config.get('TEST_OUTPUT_PATH', config['OUTPUT_PATH'])
+            max_rows = config.get('TEST_ROW_LIMIT')
+        else:
+            output_path = config['OUTPUT_PATH']
+            max_rows = None
+
+        self.logger.info(f"Report path: {report_path}")
+        self.logger.info(f"Test mode: {test_mode}")
+
+        # One fetch is written to a file per OUTPUT_FORMAT
+        targets = [(output_format, os.path.join(output_path, file_name)) for output_format, file_name
+                   in output_targets(config.get('OUTPUT_FORMAT', 'xlsx'), config['OUTPUT_FILE_NAME'])]
+        out_files = [out_file for _, out_file in targets]
+
+        # Incremental tasks fetch only rows dated since the last successful run (test runs always fetch in full)
+        incremental = is_incremental(config) and not test_mode and self.watermarks is not None
+        run_date = datetime.date.today()
+        report_filter = None
+        if incremental:
+            report_filter = await asyncio.to_thread(plan_incremental, config, out_files, self.watermarks, False, self.logger)
+
+        params, root, headers, column_types, resumed = await self._start_fetch(report_path, checkpoint, report_filter)
+        if report_filter:
+            headings = [await asyncio.to_thread(read_output_headings, output_format, out_file)
+                        for output_format, out_file in targets]
+            if any(h != list(headers.values()) for h in headings):
+                self.logger.warning("Existing output's columns differ from the report; fetching the full report")
+                report_filter = None
+                params, root, headers, column_types, resumed = await self._start_fetch(report_path, checkpoint, None)
+
+        parse_rows = make_row_parser(list(headers))
+        merge_key = config['INCREMENTAL_KEY_COLUMN'] if report_filter else None
+        writer = await asyncio.to_thread(open_outputs, targets, headers, self.hash_store, merge_key,
+                                         column_types, config.get('COMPRESSION_LEVEL'), self.cancel_token, self.logger)
+        row_count = 0
+        next_page = None
+
+        try:
+            if resumed:
+                row_count = await asyncio.to_thread(self._replay_checkpoint, checkpoint, writer, max_rows)
+                if progress_callback:
+                    progress_callback(row_count, f"Fetched {row_count} rows...")
+                if max_rows and row_count >= max_rows:
+                    self.logger.info(f"[TEST MODE] Reached max rows limit: {max_rows}")
+                    root = None
+
+            while root is not None:
+                token_elem = root.find('.//ResumptionToken')
+                is_finished = root.find('.//IsFinished')
+                finished = is_finished is not None and is_finished.text == 'true'
+                # Alma only sends the token on the first page; later pages reuse it
+                if token_elem is not None and token_elem.text:
+                    params['token'] = token_elem.text
+
+                if not finished and checkpoint is None:
+                    next_page = asyncio.create_task(self._request_page(dict(params)))
+
+                rows = await asyncio.to_thread(lambda page=root: list(parse_rows(page)))
+                # With a checkpoint the page is on disk before the next one is requested
+                if checkpoint is not None:
+                    await asyncio.to_thread(checkpoint.save_page, params.get('token'), rows)
+                    if not finished:
+                        next_page = asyncio.create_task(self._request_page(dict(params)))
+                if max_rows and row_count + len(rows) >= max_rows:
+                    rows = rows[:max_rows - row_count]
+                    self.logger.info(f"[TEST MODE] Reached max rows limit: {max_rows}")
+                    finished = True
+
+                await asyncio.to_thread(writer.writerows, rows)
+                row_count += len(rows)
+                if progress_callback:
+                    progress_callback(row_count, f"Fetched {row_count} rows...")
+
+                if finished:
+                    break
+                self._check_cancelled()
+                root = await next_page
+                next_page = None
+            self._check_cancelled()
+            await asyncio.to_thread(writer.close)
+        except BaseException as e:
+            await asyncio.to_thread(writer.abort)
+            if isinstance(e, JobCancelled):
+                self.logger.info("Cancelled; partial output discarded")
+                # A cancelled run is not resumed later, so its spilled pages go too
+                if checkpoint is not None:
+                    await asyncio.to_thread(checkpoint.clear)
+            raise
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+        # Only once the outputs are in place, so a run that fails to write them can resume
+        if checkpoint is not None:
+            await asyncio.to_thread(checkpoint.clear)
+        for output in writer.outputs:
+            if merge_key:
+                self.logger.info(f"Merged into {output.output_file}: {output.updated} rows replaced, {output.added} added")
+            if output.unchanged:
+                self.logger.info(f"Output unchanged since the last run, left {output.output_file} untouched")
+        if merge_key:
+            row_count = writer.outputs[0].row_count
+        if incremental:
+            for out_file in out_files:
+                await asyncio.to_thread(self.watermarks.put, out_file, run_date)
+        out_file = ', '.join(out_files)
+
+        stats = getattr(self.client, 'pool_stats', None)
+        if stats:
+            self.logger.info(f"HTTP pool: {stats['requests']} requests over {stats['connections']} connections")
+        self.logger.info(f"Retries: {self.retry.summary()}")
+        self.logger.info(f"Finished. Output: {out_file}, Rows: {row_count}")
+        return out_file, row_count
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, List, TypeVar
+
+T = TypeVar('T')
+
+
+class JobCancelled(Exception):
+    """The job was cancelled while it ran."""
+
+
+class CancelToken:
+    """
+    Cancellation flag for one job, shared by the event loop and the worker
+    threads writing its output. Fetchers and writers call ``check()``
+    between pages and batches; awaitables run through ``run()`` (page
+    requests, retry backoff) are abandoned as soon as ``cancel()`` is called.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancel the job. Safe to call from any thread, and more than once."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled."""
+        if self._event.is_set():
+            raise JobCancelled("Job was cancelled")
+
+    def sleep(self, seconds: float):
+        """Blocking sleep that ends early, raising JobCancelled, if the job is cancelled."""
+        if self._event.wait(seconds):
+            self.check()
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await ``awaitable``, cancelling it and raising JobCancelled if the job is cancelled first."""
+        if self.cancelled and asyncio.iscoroutine(awaitable):
+            # Never started; close it so it is not reported as never awaited
+            awaitable.close()
+        self.check()
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(awaitable)
+
+        def cancel_task():
+            loop.call_soon_threadsafe(task.cancel)
+
+        with self._lock:
+            self._callbacks.append(cancel_task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self.cancelled and task.cancelled():
+                raise JobCancelled("Job was cancelled") from None
+            raise
+        finally:
+            with self._lock:
+                if cancel_task in self._callbacks:
+                    self._callbacks.remove(cancel_task)
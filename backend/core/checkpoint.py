@@ -0,0 +1,95 @@
+import os
+import re
+import json
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+
+
+class Checkpoint:
+    """
+    On-disk checkpoint of a task's fetch, so a failed run can be resumed.
+
+    After each page its rows are appended to a JSON-lines spill file, and the
+    ResumptionToken, headers and spill size are saved to a small state file.
+    A rerun of the task replays the spilled rows and continues from the
+    token. The checkpoint is removed once the outputs are written.
+    """
+
+    def __init__(self, checkpoint_dir: str, task_name: str, report_path: str):
+        safe_name = re.sub(r'[^\w.-]', '_', task_name)
+        self.state_file = os.path.join(checkpoint_dir, f"{safe_name}.json")
+        self.spill_file = os.path.join(checkpoint_dir, f"{safe_name}.rows.jsonl")
+        self.checkpoint_dir = checkpoint_dir
+        self.report_path = unquote(report_path)
+        self.state: Optional[Dict] = None
+
+    def load(self, report_filter: Optional[str] = None) -> Optional[Dict]:
+        """
+        Load a checkpoint left by an earlier run of this task with the same
+        filter, or return None if there is none usable.
+        """
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            spill_size = os.path.getsize(self.spill_file)
+        except OSError:
+            spill_size = -1
+        if (state.get('report_path') != self.report_path or state.get('filter') != report_filter
+                or not state.get('token') or spill_size < state.get('spill_bytes', 0)):
+            self.clear()
+            return None
+        # Drop rows appended after the last saved state (the run died mid-save)
+        if spill_size > state['spill_bytes']:
+            with open(self.spill_file, 'r+b') as f:
+                f.truncate(state['spill_bytes'])
+        self.state = state
+        return state
+
+    def start(
+        self,
+        headers: Dict[str, str],
+        report_filter: Optional[str] = None,
+        column_types: Optional[Dict[str, str]] = None
+    ):
+        """Begin a fresh checkpoint, discarding any earlier one."""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.state = {'report_path': self.report_path, 'filter': report_filter, 'headers': headers,
+                      'types': column_types or {}, 'token': None, 'rows': 0, 'spill_bytes': 0}
+        open(self.spill_file, 'wb').close()
+        self._save_state()
+
+    def save_page(self, token: Optional[str], rows: List[Tuple]):
+        """Append a page of rows to the spill file and record the token to continue from."""
+        with open(self.spill_file, 'ab') as f:
+            for row in rows:
+                f.write(json.dumps(row).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+            spill_bytes = f.tell()
+        self.state.update(token=token, rows=self.state['rows'] + len(rows),
+                          spill_bytes=spill_bytes, saved_at=time.time())
+        self._save_state()
+
+    def replay(self) -> Iterator[Tuple]:
+        """Yield the spilled rows as tuples."""
+        with open(self.spill_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield tuple(json.loads(line))
+
+    def clear(self):
+        for path in (self.state_file, self.spill_file):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.state = None
+
+    def _save_state(self):
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_file)
@@ -1,12 +1,19 @@
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from models.task import Task, TaskCreate, TaskUpdate
 
 
 class ConfigManager:
+    """
+    Reads and writes the task config file. The parsed config is kept until
+    the file's mtime or size changes, so routes that look tasks up on every
+    request do not re-parse the JSON each time.
+    """
+
     def __init__(self, config_path: str):
         self.config_path = config_path
+        self._cache: Optional[Tuple[Tuple[int, int], Dict]] = None
         self._ensure_config_exists()
 
     def _ensure_config_exists(self):
@@ -14,13 +21,24 @@ class ConfigManager:
             with open(self.config_path, 'w') as f:
                 json.dump({}, f)
 
+    def _file_version(self) -> Tuple[int, int]:
+        stat = os.stat(self.config_path)
+        return stat.st_mtime_ns, stat.st_size
+
     def _read_config(self) -> Dict:
-        with open(self.config_path, 'r') as f:
-            return json.load(f)
+        # Callers get their own top-level dict; the task dicts inside are shared and must not be modified
+        version = self._file_version()
+        cache = self._cache
+        if cache is None or cache[0] != version:
+            with open(self.config_path, 'r') as f:
+                cache = (version, json.load(f))
+            self._cache = cache
+        return dict(cache[1])
 
     def _write_config(self, config: Dict):
         with open(self.config_path, 'w') as f:
             json.dump(config, f, indent=2)
+        self._cache = (self._file_version(), dict(config))
 
     def _task_from_dict(self, name: str, data: Dict) -> Task:
         return Task(
@@ -34,7 +52,14 @@ class ConfigManager:
             test_log_dir=data.get("TEST_LOG_DIR"),
             test_row_limit=data.get("TEST_ROW_LIMIT", 25),
             frequency=data.get("FREQUENCY", "daily"),
-            active=data.get("ACTIVE", True)
+            active=data.get("ACTIVE", True),
+            incremental_date_column=data.get("INCREMENTAL_DATE_COLUMN"),
+            incremental_key_column=data.get("INCREMENTAL_KEY_COLUMN"),
+            incremental_lookback_days=data.get("INCREMENTAL_LOOKBACK_DAYS", 1),
+            compression_level=data.get("COMPRESSION_LEVEL"),
+            priority=data.get("PRIORITY", 0),
+            log_compress_after_days=data.get("LOG_COMPRESS_AFTER_DAYS"),
+            log_delete_after_days=data.get("LOG_DELETE_AFTER_DAYS")
         )
 
     def _task_to_dict(self, task: Task | TaskCreate | TaskUpdate) -> Dict:
@@ -52,6 +77,18 @@ class ConfigManager:
             result["TEST_OUTPUT_PATH"] = task.test_output_path
         if task.test_log_dir:
             result["TEST_LOG_DIR"] = task.test_log_dir
+        if task.incremental_date_column and task.incremental_key_column:
+            result["INCREMENTAL_DATE_COLUMN"] = task.incremental_date_column
+            result["INCREMENTAL_KEY_COLUMN"] = task.incremental_key_column
+            result["INCREMENTAL_LOOKBACK_DAYS"] = task.incremental_lookback_days
+        if task.compression_level is not None:
+            result["COMPRESSION_LEVEL"] = task.compression_level
+        if task.priority:
+            result["PRIORITY"] = task.priority
+        if task.log_compress_after_days:
+            result["LOG_COMPRESS_AFTER_DAYS"] = task.log_compress_after_days
+        if task.log_delete_after_days:
+            result["LOG_DELETE_AFTER_DAYS"] = task.log_delete_after_days
         return result
 
     def list_tasks(self) -> List[Task]:
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Dict, List, Optional, Set
+from models.job import Job
+
+
+class JobSubscription:
+    """
+    One client's stream of job updates. Updates are coalesced per job, so a
+    client that is sent a batch every ``interval`` seconds gets each
+    changed job's latest state once, however many pages were fetched since.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float, job_id: Optional[str] = None):
+        self.loop = loop
+        self.interval = interval
+        self.job_id = job_id
+        self.pending: Dict[str, Dict] = {}
+        self.ready = asyncio.Event()
+        self.last_sent = 0.0
+
+    def push(self, job: Dict):
+        if self.job_id and job['id'] != self.job_id:
+            return
+        self.pending[job['id']] = job
+        self.ready.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict]:
+        """
+        Wait for updates and return the latest state of every changed job,
+        no sooner than ``interval`` after the previous batch. Returns an
+        empty list if nothing changed within ``timeout`` seconds.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        # Updates arriving during the rest of the interval join this batch
+        delay = self.last_sent + self.interval - self.loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        batch = list(self.pending.values())
+        self.pending.clear()
+        self.ready.clear()
+        self.last_sent = self.loop.time()
+        return batch
+
+
+class JobEventBroker:
+    """
+    Fans job state changes and progress out to streaming clients. JobManager
+    publishes every change; nothing is serialized while no one is listening.
+    ``publish`` may be called from any thread.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._subscriptions: Set[JobSubscription] = set()
+
+    def subscribe(self, job_id: Optional[str] = None) -> JobSubscription:
+        """Start a subscription, for every job or only ``job_id``. Must be called on the event loop."""
+        subscription = JobSubscription(asyncio.get_running_loop(), self.interval, job_id)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, job: Job):
+        subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            return
+        data = job.model_dump(mode='json')
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, data)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
@@ -1,12 +1,127 @@
 import uuid
-from datetime import datetime
+import sqlite3
+import threading
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from core.cancellation import CancelToken
+from core.job_events import JobEventBroker
 from models.job import Job, JobStatus
 
+ACTIVE_STATUSES = (JobStatus.PENDING, JobStatus.RUNNING)
+# Finished jobs older than the retention are pruned at most this often
+PRUNE_INTERVAL = timedelta(hours=1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    task_name TEXT NOT NULL,
+    test_mode INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    completed_at TEXT,
+    rows_fetched INTEGER NOT NULL DEFAULT 0,
+    output_file TEXT,
+    error_message TEXT,
+    progress_message TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS jobs_started_at ON jobs (started_at, id);
+CREATE INDEX IF NOT EXISTS jobs_task_name ON jobs (task_name, started_at, id);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, started_at, id);
+"""
+COLUMNS = ('id', 'task_name', 'test_mode', 'status', 'started_at', 'completed_at',
+           'rows_fetched', 'output_file', 'error_message', 'progress_message')
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    # Fixed-width ISO text so timestamps sort correctly as strings
+    return value.isoformat(timespec='microseconds') if value else None
+
 
 class JobManager:
-    def __init__(self):
-        self._jobs: Dict[str, Job] = {}
+    """
+    Job history kept in SQLite (``db_path``; the default keeps it in memory
+    for the life of the process). Pending and running jobs are also held in
+    memory, so page-by-page progress updates never touch the database; a job
+    is written when it is created and whenever its status changes.
+    Finished jobs older than ``retention_days`` are pruned.
+
+    Each active job has a CancelToken; ``cancel_job`` trips it so the run
+    stops fetching and discards its partial output. Every change, progress
+    included, is published to ``events`` for streaming clients.
+    """
+
+    def __init__(
+        self,
+        db_path: str = ":memory:",
+        retention_days: Optional[int] = None,
+        events: Optional[JobEventBroker] = None
+    ):
+        self.retention_days = retention_days
+        self.events = events
+        self.lock = threading.Lock()
+        # Guards _active and _cancel_tokens, and is held while an active job is
+        # changed and saved, so a job finished (e.g. cancelled) from another
+        # thread is never overwritten. Taken before self.lock, never after.
+        self._active_lock = threading.Lock()
+        self._active: Dict[str, Job] = {}
+        self._cancel_tokens: Dict[str, CancelToken] = {}
+        self._last_prune: Optional[datetime] = None
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self.lock:
+            if db_path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+            # Jobs left pending or running by a previous process will never finish
+            self._db.execute(
+                "UPDATE jobs SET status = ?, completed_at = ?, error_message = ? WHERE status IN (?, ?)",
+                (JobStatus.FAILED.value, _timestamp(datetime.now()), "Interrupted by a server restart",
+                 *(status.value for status in ACTIVE_STATUSES))
+            )
+            self._db.commit()
+        self.prune()
+
+    def _save(self, job: Job):
+        with self.lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                (job.id, job.task_name, int(job.test_mode), job.status.value, _timestamp(job.started_at),
+                 _timestamp(job.completed_at), job.rows_fetched, job.output_file, job.error_message,
+                 job.progress_message)
+            )
+            self._db.commit()
+        if self.events:
+            self.events.publish(job)
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row['id'],
+            task_name=row['task_name'],
+            test_mode=bool(row['test_mode']),
+            status=JobStatus(row['status']),
+            started_at=datetime.fromisoformat(row['started_at']),
+            completed_at=datetime.fromisoformat(row['completed_at']) if row['completed_at'] else None,
+            rows_fetched=row['rows_fetched'],
+            output_file=row['output_file'],
+            error_message=row['error_message'],
+            progress_message=row['progress_message']
+        )
+
+    def _finish(self, job_id: str, status: JobStatus, **fields) -> Optional[Job]:
+        """Move a job to a final status and persist it. Returns None if it is unknown or already finished."""
+        with self._active_lock:
+            job = self._active.pop(job_id, None)
+            self._cancel_tokens.pop(job_id, None)
+            if job is None:
+                return None
+            job.status = status
+            job.completed_at = datetime.now()
+            for name, value in fields.items():
+                setattr(job, name, value)
+            self._save(job)
+        return job
 
     def create_job(self, task_name: str, test_mode: bool = False) -> Job:
         job_id = str(uuid.uuid4())[:8]
@@ -17,44 +132,114 @@ class JobManager:
             status=JobStatus.PENDING,
             started_at=datetime.now()
         )
-        self._jobs[job_id] = job
+        with self._active_lock:
+            self._active[job_id] = job
+            self._cancel_tokens[job_id] = CancelToken()
+            self._save(job)
+        if self._last_prune and datetime.now() - self._last_prune > PRUNE_INTERVAL:
+            self.prune()
         return job
 
     def get_job(self, job_id: str) -> Optional[Job]:
-        return self._jobs.get(job_id)
+        with self._active_lock:
+            job = self._active.get(job_id)
+        if job is not None:
+            return job
+        with self.lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def active_jobs(self) -> List[Job]:
+        """Pending and running jobs, newest first."""
+        with self._active_lock:
+            jobs = list(self._active.values())
+        return sorted(jobs, key=lambda j: j.started_at, reverse=True)
 
-    def list_jobs(self, limit: int = 50) -> List[Job]:
-        jobs = list(self._jobs.values())
-        jobs.sort(key=lambda j: j.started_at, reverse=True)
-        return jobs[:limit]
+    def get_cancel_token(self, job_id: str) -> Optional[CancelToken]:
+        with self._active_lock:
+            return self._cancel_tokens.get(job_id)
+
+    def list_jobs(
+        self,
+        limit: int = 50,
+        before: Optional[str] = None,
+        task_name: Optional[str] = None,
+        status: Optional[JobStatus] = None
+    ) -> List[Job]:
+        """
+        Return up to ``limit`` jobs, newest first, optionally for one task or
+        status. ``before`` is the id of the last job of the previous page;
+        the next page starts after it.
+        """
+        conditions, params = [], []
+        if task_name:
+            conditions.append("task_name = ?")
+            params.append(task_name)
+        if status:
+            conditions.append("status = ?")
+            params.append(JobStatus(status).value)
+        if before:
+            conditions.append("(started_at, id) < (SELECT started_at, id FROM jobs WHERE id = ?)")
+            params.append(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self._db.execute(
+                f"SELECT * FROM jobs {where} ORDER BY started_at DESC, id DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        # Running jobs' progress is only kept in memory
+        with self._active_lock:
+            active = dict(self._active)
+        return [active.get(row['id']) or self._from_row(row) for row in rows]
+
+    def prune(self) -> int:
+        """Delete finished jobs older than the retention period and return how many were removed."""
+        self._last_prune = datetime.now()
+        if not self.retention_days:
+            return 0
+        cutoff = _timestamp(datetime.now() - timedelta(days=self.retention_days))
+        with self.lock:
+            deleted = self._db.execute(
+                "DELETE FROM jobs WHERE started_at < ? AND status NOT IN (?, ?)",
+                (cutoff, *(status.value for status in ACTIVE_STATUSES))
+            ).rowcount
+            self._db.commit()
+        return deleted
 
     def update_job_status(self, job_id: str, status: JobStatus):
-        if job_id in self._jobs:
-            self._jobs[job_id].status = status
+        if status not in ACTIVE_STATUSES:
+            self._finish(job_id, status)
+        else:
+            with self._active_lock:
+                job = self._active.get(job_id)
+                if job is not None:
+                    job.status = status
+                    self._save(job)
 
     def update_job_progress(self, job_id: str, rows_fetched: int, message: str = ""):
-        if job_id in self._jobs:
-            self._jobs[job_id].rows_fetched = rows_fetched
-            self._jobs[job_id].progress_message = message
+        with self._active_lock:
+            job = self._active.get(job_id)
+            if job is None:
+                return
+            job.rows_fetched = rows_fetched
+            job.progress_message = message
+            if self.events:
+                self.events.publish(job)
 
     def complete_job(self, job_id: str, output_file: str, rows_fetched: int):
-        if job_id in self._jobs:
-            self._jobs[job_id].status = JobStatus.COMPLETED
-            self._jobs[job_id].completed_at = datetime.now()
-            self._jobs[job_id].output_file = output_file
-            self._jobs[job_id].rows_fetched = rows_fetched
+        self._finish(job_id, JobStatus.COMPLETED, output_file=output_file, rows_fetched=rows_fetched)
 
     def fail_job(self, job_id: str, error_message: str):
-        if job_id in self._jobs:
-            self._jobs[job_id].status = JobStatus.FAILED
-            self._jobs[job_id].completed_at = datetime.now()
-            self._jobs[job_id].error_message = error_message
+        self._finish(job_id, JobStatus.FAILED, error_message=error_message)
 
     def cancel_job(self, job_id: str) -> bool:
-        if job_id in self._jobs:
-            job = self._jobs[job_id]
-            if job.status in [JobStatus.PENDING, JobStatus.RUNNING]:
-                job.status = JobStatus.CANCELLED
-                job.completed_at = datetime.now()
-                return True
-        return False
+        token = self.get_cancel_token(job_id)
+        if self._finish(job_id, JobStatus.CANCELLED) is None:
+            return False
+        # A run that already finished (or never started) ignores the token
+        token.cancel()
+        return True
+
+    def close(self):
+        with self.lock:
+            self._db.close()
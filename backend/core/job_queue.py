@@ -0,0 +1,122 @@
+import time
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from core.job_manager import ACTIVE_STATUSES, JobManager
+from models.job import Job, JobStatus
+
+# Recent queue waits kept for the wait-time stats
+WAIT_SAMPLES = 200
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class DuplicateJobError(Exception):
+    def __init__(self, job: Job):
+        super().__init__(f"Task '{job.task_name}' already has a {job.status.value} job ({job.id})")
+        self.job = job
+
+
+class JobQueue:
+    """
+    Bounded priority queue of report jobs served by a fixed pool of worker
+    coroutines. Jobs with a higher priority start first, equal priorities in
+    submission order. A task can only have one pending or running job per
+    mode (test or production) at a time. Jobs stay pending until a worker
+    picks them up; a job cancelled while queued is skipped.
+    """
+
+    def __init__(self, job_manager: JobManager, workers: int = 4, maxsize: int = 100):
+        self.job_manager = job_manager
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._order = itertools.count()
+        # (task name, test mode) -> id of the task's latest job
+        self._task_jobs: Dict[Tuple[str, bool], str] = {}
+        self._queued_at: Dict[str, float] = {}
+        self._running = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Start the workers. Must be called from the event loop that will run the jobs."""
+        self._queue = asyncio.PriorityQueue(self.maxsize)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(
+        self,
+        task_name: str,
+        test_mode: bool,
+        run: Callable[[str], Awaitable[None]],
+        priority: int = 0
+    ) -> Job:
+        """
+        Create a job for a task and queue ``run(job_id)``. Raises
+        DuplicateJobError if the task already has a pending or running job in
+        the same mode, and QueueFullError if the queue is at ``maxsize``.
+        """
+        key = (task_name, test_mode)
+        previous = self._task_jobs.get(key)
+        if previous:
+            job = self.job_manager.get_job(previous)
+            if job and job.status in ACTIVE_STATUSES:
+                raise DuplicateJobError(job)
+        if self._queue.full():
+            raise QueueFullError(f"The job queue is full ({self.maxsize} jobs waiting)")
+
+        job = self.job_manager.create_job(task_name, test_mode)
+        self._task_jobs[key] = job.id
+        self._queued_at[job.id] = time.monotonic()
+        self._queue.put_nowait((-priority, next(self._order), job.id, run))
+        return job
+
+    async def _worker(self):
+        while True:
+            _, _, job_id, run = await self._queue.get()
+            try:
+                waited = time.monotonic() - self._queued_at.pop(job_id)
+                job = self.job_manager.get_job(job_id)
+                if job is None or job.status != JobStatus.PENDING:
+                    continue
+                self._waits.append(waited)
+                self.job_manager.update_job_status(job_id, JobStatus.RUNNING)
+                self._running += 1
+                try:
+                    await run(job_id)
+                finally:
+                    self._running -= 1
+            except Exception as e:
+                # run() reports its own failures, but a job it never got to
+                # finish would block its task from running again
+                self.logger.exception(f"Job {job_id} raised out of its worker")
+                self.job_manager.fail_job(job_id, str(e))
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        """Queue depth, busy workers and the wait of recently started jobs, for sizing the pool."""
+        waits = sorted(self._waits)
+        now = time.monotonic()
+        return {
+            'workers': self.workers,
+            'running': self._running,
+            'queued': self._queue.qsize() if self._queue else 0,
+            'max_queued': self.maxsize,
+            'oldest_queued_seconds': round(now - min(self._queued_at.values()), 3) if self._queued_at else 0,
+            'recent_waits': len(waits),
+            'avg_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0,
+            'p95_wait_seconds': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0,
+            'max_wait_seconds': round(waits[-1], 3) if waits else 0,
+        }
@@ -0,0 +1,179 @@
+import os
+import re
+import gzip
+import time
+import shutil
+import logging
+from collections import deque
+from typing import Optional, Tuple
+
+# Bytes read per step when seeking backwards from the end of a log
+TAIL_BLOCK_SIZE = 64 * 1024
+# Most bytes a follow read returns at once
+FOLLOW_MAX_BYTES = 1024 * 1024
+# Logs past LOG_COMPRESS_AFTER_DAYS are gzipped to <name>.log.gz
+COMPRESSED_SUFFIX = '.gz'
+
+
+def is_compressed(path: str) -> bool:
+    return path.endswith(COMPRESSED_SUFFIX)
+
+
+def log_size(path: str) -> int:
+    """
+    Length of a log's text in bytes, the range its offsets refer to. For a
+    gzipped log that is the uncompressed length, read from the gzip trailer
+    (which holds it modulo 4 GiB, far more than a task's log reaches).
+    """
+    if not is_compressed(path):
+        return os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if f.seek(0, os.SEEK_END) < 4:
+            return 0
+        f.seek(-4, os.SEEK_END)
+        return int.from_bytes(f.read(4), 'little')
+
+
+def _read_compressed_lines_before(path: str, end: Optional[int], lines: int) -> Tuple[str, int, int]:
+    # A gzip stream cannot be read backwards; offsets are into the uncompressed text
+    tail = deque(maxlen=lines)
+    offset = 0
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            if end is not None and offset + len(line) > end:
+                line = line[:end - offset]
+                if line:
+                    tail.append(line)
+                    offset += len(line)
+                break
+            tail.append(line)
+            offset += len(line)
+    data = b''.join(tail)
+    return data.decode('utf-8', errors='replace'), offset - len(data), offset
+
+
+def read_log_text(path: str, end: Optional[int] = None) -> Tuple[str, int]:
+    """
+    The whole text of a log (up to byte offset ``end``), decompressing a
+    gzipped one. Returns (text, byte offset of its end).
+    """
+    with (gzip.open(path, 'rb') if is_compressed(path) else open(path, 'rb')) as f:
+        data = f.read() if end is None else f.read(max(0, end))
+    return data.decode('utf-8', errors='replace'), len(data)
+
+
+def read_lines_before(path: str, end: Optional[int], lines: int) -> Tuple[str, int, int]:
+    """
+    Return the last ``lines`` lines of a file ending at byte offset ``end``
+    (the end of the file if None), reading backwards in blocks so only the
+    tail is read however large the file is. Returns (text, start, end):
+    ``start`` is the byte offset of the first line returned, to pass as
+    ``end`` when paging further back. Gzipped logs are read transparently.
+    """
+    if is_compressed(path):
+        return _read_compressed_lines_before(path, end, lines)
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size if end is None else max(0, min(end, size))
+        start = end
+        data = b''
+        # A newline ending the range does not start another line
+        while start > 0:
+            step = min(TAIL_BLOCK_SIZE, start)
+            start -= step
+            f.seek(start)
+            data = f.read(step) + data
+            if data.count(b'\n', 0, len(data) - 1) >= lines:
+                break
+
+    pos = len(data) - 1 if data.endswith(b'\n') else len(data)
+    for _ in range(lines):
+        pos = data.rfind(b'\n', 0, pos)
+        if pos == -1:
+            break
+    if pos != -1:
+        start += pos + 1
+        data = data[pos + 1:]
+    return data.decode('utf-8', errors='replace'), start, end
+
+
+def read_lines_after(path: str, offset: int, max_bytes: int = FOLLOW_MAX_BYTES) -> Tuple[str, int]:
+    """
+    Return the complete lines appended to a file since byte offset
+    ``offset`` and the offset after them. A line still being written is
+    left for the next call. If the file has shrunk (it was replaced or
+    truncated) reading starts again from the beginning.
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < offset:
+            offset = 0
+        if size == offset:
+            return '', offset
+        f.seek(offset)
+        data = f.read(min(size - offset, max_bytes))
+    cut = data.rfind(b'\n') + 1
+    if cut == 0 and len(data) == max_bytes:
+        # A single line longer than max_bytes is passed on in pieces
+        cut = len(data)
+    return data[:cut].decode('utf-8', errors='replace'), offset + cut
+
+
+def compress_log(path: str) -> str:
+    """Gzip a log to ``<path>.gz``, keeping its modification time, and remove the original."""
+    gz_path = f"{path}{COMPRESSED_SUFFIX}"
+    tmp_path = f"{gz_path}.tmp"
+    stat = os.stat(path)
+    try:
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as raw:
+            with gzip.GzipFile(os.path.basename(path), 'wb', fileobj=raw, mtime=int(stat.st_mtime)) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+        os.replace(tmp_path, gz_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.remove(path)
+    return gz_path
+
+
+def apply_log_retention(
+    log_dir: str,
+    task_name: str,
+    compress_after_days: Optional[int] = None,
+    delete_after_days: Optional[int] = None,
+    logger: Optional[logging.Logger] = None
+) -> Tuple[int, int]:
+    """
+    Gzip a task's logs last written more than ``compress_after_days`` ago
+    and delete those older than ``delete_after_days``. Only logs named for
+    the task are touched, since tasks may share a LOG_DIR; a ``task_name``
+    of "" selects the logs of whole CLI runs. Ages under a day count as one
+    day, so a log still being written is never touched.
+    Returns (logs compressed, logs deleted).
+    """
+    logger = logger or logging.getLogger()
+    if not (compress_after_days or delete_after_days) or not os.path.isdir(log_dir):
+        return 0, 0
+    prefix = f"download_analytics_log_{re.escape(task_name)}_" if task_name else "download_analytics_log_"
+    name = re.compile(rf"^{prefix}\d{{8}}_\d{{6}}\.log(\.gz)?$")
+    now = time.time()
+    compressed = deleted = 0
+    with os.scandir(log_dir) as entries:
+        logs = [entry for entry in entries if name.match(entry.name)]
+    for entry in logs:
+        try:
+            age_days = (now - entry.stat().st_mtime) / 86400
+            if delete_after_days and age_days > max(1, delete_after_days):
+                os.remove(entry.path)
+                deleted += 1
+            elif compress_after_days and age_days > max(1, compress_after_days) and not is_compressed(entry.name):
+                compress_log(entry.path)
+                compressed += 1
+        except OSError as e:
+            # Another run of the task may be pruning the same directory
+            logger.warning(f"Log retention skipped {entry.name}: {e}")
+    if compressed or deleted:
+        logger.info(f"Log retention: {compressed} logs compressed, {deleted} deleted in {log_dir}")
+    return compressed, deleted
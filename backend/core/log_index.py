@@ -0,0 +1,194 @@
+import os
+import re
+import gzip
+import time
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Tuple
+from core.log_files import is_compressed
+
+# Logs past their task's LOG_COMPRESS_AFTER_DAYS are gzipped
+LOG_SUFFIXES = ('.log', '.log.gz')
+# download_analytics_log_<task>_<YYYYmmdd_HHMMSS>.log, as named by setup_logging
+LOG_NAME = re.compile(r'^download_analytics_log_(?:(?P<task>.+)_)?(?P<stamp>\d{8}_\d{6})\.')
+# A log modified this recently may still be written to, so it is re-stat'ed even if its directory is unchanged
+ACTIVE_SECONDS = 3600
+# Bytes of a log searched at a time
+SEARCH_CHUNK_SIZE = 1024 * 1024
+# Searches of unchanged logs whose matches are kept, and the most matches kept for one
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_MAX_HITS = 1000
+
+
+class IndexedLog(NamedTuple):
+    name: str
+    path: str
+    size: int
+    modified: float
+    # When the run began, from the file name (the modification time if the name has no timestamp)
+    started: float
+    # Task named in the file name, if any
+    task: Optional[str]
+
+
+def is_log_file(name: str) -> bool:
+    return name.endswith(LOG_SUFFIXES)
+
+
+def _index_entry(name: str, path: str, stat: os.stat_result) -> IndexedLog:
+    match = LOG_NAME.match(name)
+    started = stat.st_mtime
+    if match:
+        try:
+            started = datetime.datetime.strptime(match.group('stamp'), '%Y%m%d_%H%M%S').timestamp()
+        except ValueError:
+            pass
+    return IndexedLog(name, path, stat.st_size, stat.st_mtime, started, match.group('task') if match else None)
+
+
+class LogIndex:
+    """
+    In-memory index of the log files in each log directory. A directory is
+    only listed again when its mtime changes (a log was added, renamed or
+    removed), and then only new files and logs still being written are
+    stat'ed; older logs are taken from the index as they were. The matches
+    of recent searches are kept per log, so a repeated search does not read
+    logs that have not changed since.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._dirs: Dict[str, Tuple[int, Dict[str, IndexedLog]]] = {}
+        self._searches: OrderedDict = OrderedDict()
+
+    def files(self, log_dir: str) -> List[IndexedLog]:
+        """The log files in ``log_dir``, newest first."""
+        try:
+            dir_mtime = os.stat(log_dir).st_mtime_ns
+        except OSError:
+            with self.lock:
+                self._dirs.pop(log_dir, None)
+            return []
+        with self.lock:
+            cached_mtime, cached = self._dirs.get(log_dir, (None, {}))
+        active_since = time.time() - ACTIVE_SECONDS
+
+        entries: Dict[str, IndexedLog] = {}
+        if cached_mtime == dir_mtime:
+            for name, entry in cached.items():
+                if entry.modified < active_since:
+                    entries[name] = entry
+                    continue
+                try:
+                    entries[name] = _index_entry(name, entry.path, os.stat(entry.path))
+                except FileNotFoundError:
+                    pass
+        else:
+            with os.scandir(log_dir) as it:
+                for dir_entry in it:
+                    if not is_log_file(dir_entry.name):
+                        continue
+                    entry = cached.get(dir_entry.name)
+                    if entry is not None and entry.modified < active_since:
+                        entries[dir_entry.name] = entry
+                        continue
+                    try:
+                        if dir_entry.is_file():
+                            entries[dir_entry.name] = _index_entry(dir_entry.name, dir_entry.path, dir_entry.stat())
+                    except FileNotFoundError:
+                        pass
+
+        with self.lock:
+            self._dirs[log_dir] = (dir_mtime, entries)
+        return sorted(entries.values(), key=lambda e: e.modified, reverse=True)
+
+    def search(self, entries: Iterable[IndexedLog], pattern: Pattern, limit: int) -> Tuple[List[Tuple[IndexedLog, int, str]], int, bool]:
+        """
+        Search logs in order until ``limit`` matching lines are found.
+        Returns (hits as (log, line number, line), files searched, truncated).
+        """
+        hits = []
+        searched = 0
+        for entry in entries:
+            searched += 1
+            key = (entry.path, entry.size, entry.modified, pattern.pattern, pattern.flags)
+            with self.lock:
+                matches = self._searches.get(key)
+                if matches is not None:
+                    self._searches.move_to_end(key)
+            if matches is None:
+                matches = []
+                complete = True
+                scan = search_log(entry.path, pattern)
+                try:
+                    for match in scan:
+                        matches.append(match)
+                        if len(hits) + len(matches) > limit:
+                            complete = False
+                            break
+                except FileNotFoundError:
+                    continue
+                finally:
+                    scan.close()
+                if complete and len(matches) <= SEARCH_CACHE_MAX_HITS:
+                    with self.lock:
+                        self._searches[key] = matches
+                        while len(self._searches) > SEARCH_CACHE_SIZE:
+                            self._searches.popitem(last=False)
+            for line_number, line in matches:
+                if len(hits) == limit:
+                    return hits, searched, True
+                hits.append((entry, line_number, line))
+        return hits, searched, False
+
+
+def in_date_range(entry: IndexedLog, since: Optional[datetime.date], until: Optional[datetime.date]) -> bool:
+    """Whether a run's log covers any day from ``since`` to ``until`` (inclusive)."""
+    if since and datetime.date.fromtimestamp(entry.modified) < since:
+        return False
+    if until and datetime.date.fromtimestamp(entry.started) > until:
+        return False
+    return True
+
+
+def _search_text(text: str, pattern: Pattern) -> Iterator[Tuple[int, str]]:
+    # Searching the whole text is much faster than testing line by line when matches are rare
+    line_number, counted_to, last_line_end = 1, 0, -1
+    for match in pattern.finditer(text):
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        if line_start <= last_line_end:
+            continue  # another match on a line already reported
+        line_number += text.count('\n', counted_to, line_start)
+        counted_to = line_start
+        line_end = text.find('\n', match.start())
+        if line_end == -1:
+            line_end = len(text)
+        last_line_end = line_end
+        yield line_number, text[line_start:line_end].rstrip('\r')
+
+
+def search_log(path: str, pattern: Pattern) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (line number, line) for each line of a log matching ``pattern``.
+    The log (decompressed if gzipped) is read in chunks of whole lines, so
+    memory stays bounded however large it is.
+    """
+    line_number = 1
+    with (gzip.open(path, 'rb') if is_compressed(path) else open(path, 'rb')) as f:
+        carry = b''
+        while True:
+            block = f.read(SEARCH_CHUNK_SIZE)
+            data = carry + block
+            if block:
+                cut = data.rfind(b'\n') + 1
+                if cut == 0:
+                    carry = data  # a line longer than the chunk; read on to its end
+                    continue
+                data, carry = data[:cut], data[cut:]
+            text = data.decode('utf-8', errors='replace')
+            for chunk_line, line in _search_text(text, pattern):
+                yield line_number + chunk_line - 1, line
+            line_number += text.count('\n')
+            if not block:
+                return
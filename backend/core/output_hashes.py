@@ -0,0 +1,38 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Optional
+
+
+class OutputHashStore:
+    """
+    JSON file recording a content hash of the last output written to each path.
+
+    Kept outside the output folders so that it is never picked up by the
+    sync client that watches them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, output_file: str) -> Optional[str]:
+        with self.lock:
+            return self._load().get(os.path.abspath(output_file), {}).get('sha256')
+
+    def put(self, output_file: str, digest: str, row_count: int):
+        with self.lock:
+            hashes = self._load()
+            hashes[os.path.abspath(output_file)] = {'sha256': digest, 'rows': row_count, 'written_at': time.time()}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(hashes, f, indent=2)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,111 @@
+import time
+import asyncio
+import datetime
+import threading
+from typing import Dict, Mapping, Optional
+
+# Seconds between probe requests while the daily quota is spent, in case it was reset or raised
+QUOTA_PROBE_INTERVAL = 600
+
+
+class QuotaExhaustedError(RuntimeError):
+    pass
+
+
+class RateGovernor:
+    """
+    Token bucket shared by every request to the Alma API.
+
+    Each request takes a token before it is sent; tokens refill at
+    ``rate_per_second`` up to ``burst``. Responses are fed back through
+    observe(): Alma's X-Exl-Api-Remaining header tracks the daily quota, and
+    a 429 pauses all callers for the Retry-After period (1s if absent).
+    Once the daily quota falls to ``daily_reserve`` further requests raise
+    QuotaExhaustedError instead of being sent, until Alma's quota resets at
+    midnight UTC; every QUOTA_PROBE_INTERVAL seconds one request is let
+    through anyway to read the quota afresh.
+    """
+
+    def __init__(self, rate_per_second: float = 20.0, burst: Optional[int] = None, daily_reserve: int = 0):
+        self.rate_per_second = rate_per_second
+        self.capacity = burst or max(1, int(rate_per_second))
+        self.daily_reserve = daily_reserve
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self.daily_remaining: Optional[int] = None
+        # When daily_remaining was last read (time.time())
+        self._remaining_observed = 0.0
+
+    def _check_quota(self):
+        """Called with the lock held once the daily quota is spent: raise QuotaExhaustedError, or let a request through."""
+        now = time.time()
+        observed_day = datetime.datetime.fromtimestamp(self._remaining_observed, datetime.timezone.utc).date()
+        if observed_day != datetime.datetime.fromtimestamp(now, datetime.timezone.utc).date():
+            # A new day's quota
+            self.daily_remaining = None
+        elif now - self._remaining_observed >= QUOTA_PROBE_INTERVAL:
+            # One probe; the rest wait for its response to update daily_remaining
+            self._remaining_observed = now
+        else:
+            raise QuotaExhaustedError(
+                f"Alma daily API quota reached ({self.daily_remaining} calls remaining)"
+            )
+
+    def _reserve(self) -> float:
+        """Take a token and return how long the caller has to wait before sending."""
+        with self._lock:
+            if self.daily_remaining is not None and self.daily_remaining <= self.daily_reserve:
+                self._check_quota()
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate_per_second if self._tokens < 0 else 0.0
+            wait = max(wait, self._paused_until - now)
+            self.requests += 1
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        remaining = headers.get('X-Exl-Api-Remaining')
+        with self._lock:
+            if remaining is not None:
+                try:
+                    self.daily_remaining = int(remaining)
+                    self._remaining_observed = time.time()
+                except ValueError:
+                    pass
+            if status_code == 429:
+                self.throttled += 1
+                try:
+                    retry_after = float(headers.get('Retry-After', 1))
+                except ValueError:
+                    retry_after = 1.0
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'rate_per_second': self.rate_per_second,
+                'burst': self.capacity,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited_seconds, 3),
+                'daily_remaining': self.daily_remaining,
+                'daily_reserve': self.daily_reserve
+            }
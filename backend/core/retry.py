@@ -0,0 +1,38 @@
+import random
+from typing import Optional
+
+
+class AlmaAPIError(Exception):
+    """A page request failed for good: a non-retryable error or retries ran out."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        # HTTP status of a non-retryable response; None when retries ran out
+        self.status_code = status_code
+
+
+class RetryPolicy:
+    """
+    Retry schedule for page requests, plus counters for one report run.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried with
+    exponential backoff and full jitter. A retry replays exactly the same
+    params, so the same ResumptionToken is asked for again rather than the
+    page being skipped. Other responses fail at once.
+    """
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_retries: int = 4, backoff_base: float = 2.0, backoff_max: float = 60.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempts = 0
+        self.retries = 0
+        self.retry_seconds = 0.0
+
+    def backoff(self, retry_number: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry_number - 1)))
+
+    def summary(self) -> str:
+        return (f"{self.attempts} page requests, {self.retries} retries, "
+                f"{self.retry_seconds:.1f}s spent on failed attempts and backoff")
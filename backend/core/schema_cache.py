@@ -0,0 +1,52 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Optional
+from urllib.parse import unquote
+
+
+class SchemaCache:
+    """
+    On-disk cache of report column maps, keyed by report path.
+
+    The first results page already embeds the report's XSD schema, so a
+    normal run does not need the cache. It lets get_report_headers answer
+    without an API call, and supplies the columns when a fetch continues
+    from a ResumptionToken, since those pages carry no schema.
+    """
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = 86400):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, report_path: str) -> str:
+        key = hashlib.sha1(unquote(report_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, report_path: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self._path(report_path), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('cached_at', 0) > self.ttl_seconds:
+            return None
+        return entry.get('headers') or None
+
+    def get_types(self, report_path: str) -> Dict[str, str]:
+        """Return the cached column name -> xsd type dict (empty if not cached)."""
+        try:
+            with open(self._path(report_path), 'r', encoding='utf-8') as f:
+                return json.load(f).get('types') or {}
+        except (OSError, ValueError):
+            return {}
+
+    def put(self, report_path: str, headers: Dict[str, str], column_types: Optional[Dict[str, str]] = None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(report_path)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'report_path': unquote(report_path), 'cached_at': time.time(),
+                       'headers': headers, 'types': column_types or {}}, f)
+        os.replace(tmp_path, path)
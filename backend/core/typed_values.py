@@ -0,0 +1,102 @@
+import math
+import datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Value kind of each xsd type used in report schemas; anything else is a string
+XSD_KINDS = {
+    'int': 'int', 'integer': 'int', 'long': 'int', 'short': 'int', 'byte': 'int',
+    'unsignedInt': 'int', 'unsignedLong': 'int', 'unsignedShort': 'int', 'unsignedByte': 'int',
+    'double': 'float', 'float': 'float', 'decimal': 'decimal',
+    'date': 'date', 'dateTime': 'datetime', 'boolean': 'bool',
+}
+# Rows converted together (one Alma page)
+CONVERT_BATCH_SIZE = 1000
+
+
+def column_kind(xsd_type: Optional[str]) -> str:
+    """Return the value kind ("int", "float", "decimal", "date", "datetime", "bool" or "string") of an xsd type."""
+    return XSD_KINDS.get((xsd_type or '').split(':')[-1], 'string')
+
+
+def _parse_bool(text: str) -> bool:
+    return text in ('true', '1')
+
+
+VALUE_PARSERS = {
+    'int': int,
+    'float': float,
+    'decimal': Decimal,
+    'date': datetime.date.fromisoformat,
+    'datetime': datetime.datetime.fromisoformat,
+    'bool': _parse_bool,
+}
+
+
+def _convert_cell(value, parse: Callable):
+    """Convert one cell: blanks become None, and a value that does not parse is kept as it is."""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        # Rows read back from an existing XLSX output are typed already, but dates come back as datetimes
+        if parse == datetime.date.fromisoformat and isinstance(value, datetime.datetime):
+            return value.date()
+        return value
+    try:
+        return parse(value)
+    except (ValueError, ArithmeticError):
+        return value
+
+
+def key_text(value, kind: str) -> str:
+    """
+    Render a key cell in one form whether it is Alma's text or a typed value
+    read back from an XLSX or Parquet output, so that "2024-01-01T10:00:05"
+    and datetime(2024, 1, 1, 10, 0, 5), or "3.50" and 3.5, are the same key.
+    """
+    parse = VALUE_PARSERS.get(kind)
+    if parse:
+        value = _convert_cell(value, parse)
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (float, Decimal)) and math.isfinite(value):
+        # Excel stores every number as a double: 3, 3.0 and Decimal("3.00") are one key
+        return str(int(value)) if value == int(value) else repr(float(value))
+    return str(value)
+
+
+def _convert_column(values: Sequence, parse: Callable) -> Sequence:
+    # A column without blanks is parsed in one map() call; only columns with
+    # blanks or bad values fall back to checking each cell
+    if '' not in values and None not in values:
+        try:
+            return list(map(parse, values))
+        except (TypeError, ValueError, ArithmeticError):
+            pass
+    return [_convert_cell(value, parse) for value in values]
+
+
+def make_batch_converter(
+    columns: List[str],
+    column_types: Dict[str, str]
+) -> Optional[Callable[[Sequence[Sequence]], List[Tuple]]]:
+    """
+    Build a converter that turns a batch of text rows into typed rows using
+    the report schema's xsd column types. The batch is converted column by
+    column rather than cell by cell; string columns are passed through.
+    Returns None if no column needs converting.
+    """
+    parsers = [VALUE_PARSERS.get(column_kind(column_types.get(name))) for name in columns]
+    if not any(parsers):
+        return None
+
+    def convert(rows: Sequence[Sequence]) -> List[Tuple]:
+        converted = [_convert_column(values, parse) if parse else values
+                     for values, parse in zip(zip(*rows), parsers)]
+        return list(zip(*converted))
+
+    return convert
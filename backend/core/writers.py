@@ -0,0 +1,603 @@
+import io
+import os
+import csv
+import gzip
+import hashlib
+import logging
+import datetime
+from decimal import Context, Decimal
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import openpyxl
+from core.cancellation import CancelToken
+from core.output_hashes import OutputHashStore
+from core.typed_values import CONVERT_BATCH_SIZE, column_kind, key_text, make_batch_converter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for parquet output
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .zst output
+    zstandard = None
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 50000
+# Digits kept after the point in Parquet decimal columns (decimal128 holds 38 in all); longer fractions are rounded
+PARQUET_DECIMAL_SCALE = 10
+# Formats a task can write; OUTPUT_FORMAT is one of these or a list of them
+OUTPUT_FORMATS = ('xlsx', 'csv', 'tsv', 'parquet', 'csv.gz', 'tsv.gz', 'csv.zst', 'tsv.zst')
+# Compression suffixes of CSV/TSV formats ("csv.gz", "tsv.zst") -> (default level, valid levels)
+COMPRESSION_LEVELS = {'gz': (6, range(0, 10)), 'zst': (3, range(1, 23))}
+# Rows merged between checks of a cancel token
+CANCEL_CHECK_ROWS = 10000
+
+
+def split_format(output_format: str) -> Tuple[str, Optional[str]]:
+    """
+    Split an output format such as "tsv.gz" into its base format and its
+    compression ("gz", "zst" or None), checking that the pair is supported.
+    """
+    base_format, _, compression = output_format.partition('.')
+    if not compression:
+        return base_format, None
+    if base_format not in ('csv', 'tsv') or compression not in COMPRESSION_LEVELS:
+        raise ValueError(f"Unsupported output format: {output_format} (only csv and tsv can be .gz or .zst)")
+    if compression == 'zst' and zstandard is None:
+        raise ValueError("zstd output needs the zstandard package (pip install zstandard)")
+    return base_format, compression
+
+
+def check_compression_level(compression: str, level: Optional[int]) -> int:
+    """Return the level to compress at, checking a configured COMPRESSION_LEVEL against the codec's range."""
+    default, levels = COMPRESSION_LEVELS[compression]
+    if level is None:
+        return default
+    if level not in levels:
+        raise ValueError(f"COMPRESSION_LEVEL for .{compression} output must be {levels[0]}-{levels[-1]}, got {level}")
+    return level
+
+
+def compress_stream(raw: BinaryIO, compression: str, level: int) -> BinaryIO:
+    """Wrap a binary file so whatever is written to it is compressed as it streams."""
+    if compression == 'gz':
+        # No file name or timestamp in the header; the name would be the .tmp file's
+        return gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).stream_writer(raw)
+
+
+def decompress_stream(raw: BinaryIO, compression: str) -> BinaryIO:
+    """Wrap a binary file so it reads back decompressed."""
+    if compression == 'gz':
+        return gzip.GzipFile(filename='', mode='rb', fileobj=raw)
+    return zstandard.ZstdDecompressor().stream_reader(raw)
+
+
+class XlsxStreamWriter:
+    """
+    Write-only XLSX writer. openpyxl's write-only mode serialises each row as
+    it is appended instead of keeping every cell object until save, so memory
+    stays bounded no matter how many rows a report has. Numeric, date and
+    boolean columns are converted from text in batches of CONVERT_BATCH_SIZE
+    rows so they are stored as native Excel cells.
+    """
+
+    def __init__(self, output_file: str, headers: Dict[str, str], column_types: Optional[Dict[str, str]] = None):
+        self.output_file = output_file
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.ws.append(list(headers.values()))
+        self.convert = make_batch_converter(list(headers), column_types or {})
+        self.batch: List[Sequence] = []
+
+    def writerow(self, values: Sequence):
+        if self.convert is None:
+            self.ws.append(values)
+            return
+        self.batch.append(values)
+        if len(self.batch) >= CONVERT_BATCH_SIZE:
+            self._write_batch()
+
+    def writerows(self, rows: Iterable[Sequence]):
+        if self.convert is None:
+            for values in rows:
+                self.ws.append(values)
+            return
+        self.batch.extend(rows)
+        if len(self.batch) >= CONVERT_BATCH_SIZE:
+            self._write_batch()
+
+    def _write_batch(self):
+        for values in self.convert(self.batch):
+            self.ws.append(values)
+        self.batch = []
+
+    def close(self):
+        if self.batch:
+            self._write_batch()
+        self.wb.save(self.output_file)
+
+    def abort(self):
+        # Rows appended so far live in an openpyxl temp file; finish and drop it instead of saving
+        self.ws.close()
+        self.ws._writer.cleanup()
+
+
+class DelimitedWriter:
+    """
+    CSV/TSV writer that writes each row to disk as it arrives. With a
+    ``compression`` ("gz" or "zst") the rows are compressed as they stream,
+    so the uncompressed file never touches the disk.
+    """
+
+    def __init__(
+        self,
+        output_file: str,
+        headers: Dict[str, str],
+        delimiter: str = ',',
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None
+    ):
+        self.output_file = output_file
+        self.raw = open(output_file, 'wb')
+        stream = compress_stream(self.raw, compression, compression_level) if compression else self.raw
+        self.f = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.f, delimiter=delimiter)
+        self.writer.writerow(headers.values())
+
+    def writerow(self, values: Sequence):
+        self.writer.writerow(values)
+
+    def writerows(self, rows: Iterable[Sequence]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        # Closing the text layer flushes the compressor's trailer; gzip leaves the file itself open
+        self.f.close()
+        self.raw.close()
+
+    def abort(self):
+        self.close()
+
+
+def arrow_type(xsd_type: Optional[str]) -> "pa.DataType":
+    """Return the Parquet (Arrow) column type for an xsd type."""
+    kind = column_kind(xsd_type)
+    if kind == 'int':
+        return pa.int64()
+    if kind == 'float':
+        return pa.float64()
+    if kind == 'decimal':
+        # Exact, unlike a double, so amounts such as fines read back as they were
+        return pa.decimal128(38, PARQUET_DECIMAL_SCALE)
+    if kind == 'date':
+        return pa.date32()
+    if kind == 'datetime':
+        return pa.timestamp('us')
+    if kind == 'bool':
+        return pa.bool_()
+    return pa.string()
+
+
+def _parquet_cell(value: str, field_type: "pa.DataType"):
+    """Convert one text cell to a Parquet column type, raising ValueError or ArithmeticError if it does not fit."""
+    if pa.types.is_decimal(field_type):
+        # Rounded to the column's scale instead of rejected for having more decimal places
+        quantum = Decimal(1).scaleb(-field_type.scale)
+        number = Decimal(value).quantize(quantum, context=Context(prec=field_type.precision))
+        if not number.is_finite():
+            raise ValueError(f"{value} is not a finite number")
+        return number
+    return pa.scalar(value, pa.string()).cast(field_type).as_py()
+
+
+class ParquetStreamWriter:
+    """
+    Parquet writer that buffers rows and writes them out as row groups of
+    PARQUET_ROW_GROUP_SIZE rows, so memory is bounded by one row group.
+    Column types come from the report schema's xsd types; blank cells are
+    written as nulls, and so are cells that do not parse as their column's
+    type (where XLSX keeps them as text), with a warning.
+    """
+
+    def __init__(
+        self,
+        output_file: str,
+        headers: Dict[str, str],
+        column_types: Optional[Dict[str, str]] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        column_types = column_types or {}
+        self.output_file = output_file
+        self.logger = logger or logging.getLogger()
+        self.schema = pa.schema([pa.field(heading, arrow_type(column_types.get(name)))
+                                 for name, heading in headers.items()])
+        self.writer = pq.ParquetWriter(output_file, self.schema, compression='zstd')
+        self.rows: List[Sequence] = []
+
+    def writerow(self, values: Sequence):
+        self.rows.append(values)
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self._write_row_group()
+
+    def writerows(self, rows: Iterable[Sequence]):
+        self.rows.extend(rows)
+        if len(self.rows) >= PARQUET_ROW_GROUP_SIZE:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        columns = zip(*self.rows)
+        arrays = [self._column_array(field, values) for field, values in zip(self.schema, columns)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows = []
+
+    def _column_array(self, field: "pa.Field", values: Sequence) -> "pa.Array":
+        # Cells arrive as text; each column is parsed into its type in one Arrow cast
+        text = [None if v == '' else v for v in values]
+        try:
+            return pa.array(text, type=pa.string()).cast(field.type)
+        except pa.ArrowInvalid:
+            pass
+        # Some cell does not fit the type: convert cell by cell so only the bad ones are lost
+        cells, bad = [], []
+        for value in text:
+            try:
+                cells.append(None if value is None else _parquet_cell(value, field.type))
+            except (ValueError, ArithmeticError):
+                cells.append(None)
+                bad.append(value)
+        if bad:
+            self.logger.warning(f"Column '{field.name}': {len(bad)} values are not {field.type} "
+                                f"and were written as nulls (first: {bad[0]!r})")
+        return pa.array(cells, type=field.type)
+
+    def close(self):
+        if self.rows:
+            self._write_row_group()
+        self.writer.close()
+
+    def abort(self):
+        self.writer.close()
+
+
+def open_writer(
+    output_format: str,
+    headers: Dict[str, str],
+    output_file: str,
+    column_types: Optional[Dict[str, str]] = None,
+    compression_level: Optional[int] = None,
+    logger: Optional[logging.Logger] = None
+):
+    """
+    Create the streaming writer for an output format. ``compression_level``
+    applies to .gz/.zst formats (the codec's default if None); ``logger``
+    gets the Parquet writer's warnings about cells that do not parse.
+    """
+    base_format, compression = split_format(output_format)
+    if compression:
+        compression_level = check_compression_level(compression, compression_level)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    if base_format == 'xlsx':
+        return XlsxStreamWriter(output_file, headers, column_types)
+    if base_format == 'parquet':
+        if pa is None:
+            raise ValueError("Parquet output needs the pyarrow package (pip install pyarrow)")
+        return ParquetStreamWriter(output_file, headers, column_types, logger)
+    return DelimitedWriter(output_file, headers, delimiter='\t' if base_format == 'tsv' else ',',
+                           compression=compression, compression_level=compression_level)
+
+
+class AtomicOutput:
+    """
+    Streaming writer that writes to ``<output_file>.tmp`` and only moves it
+    over the output file on close, so readers never see a half-written file
+    (sync clients such as OneDrive also skip .tmp files).
+
+    The row data is hashed as it is written. With a hash store, an output
+    whose hash matches the previous run's is left untouched and the temp
+    file is dropped, so an unchanged report is not uploaded again.
+
+    ``close()`` is ``finish()``, which completes the temp file, followed by
+    ``commit()``, which moves it into place; TeeOutput calls them separately.
+    """
+
+    def __init__(
+        self,
+        output_format: str,
+        headers: Dict[str, str],
+        output_file: str,
+        hash_store: Optional[OutputHashStore] = None,
+        column_types: Optional[Dict[str, str]] = None,
+        compression_level: Optional[int] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        self.output_file = output_file
+        self.tmp_file = f"{output_file}.tmp"
+        self.hash_store = hash_store
+        self.row_count = 0
+        self.unchanged = False
+        self.finished = False
+        # Column types are part of the digest since they change how cells are written
+        kinds = [column_kind((column_types or {}).get(name)) for name in headers]
+        self.digest = hashlib.sha256(repr((output_format, list(headers.values()), kinds)).encode('utf-8'))
+        self.writer = open_writer(output_format, headers, self.tmp_file, column_types, compression_level, logger)
+
+    def writerow(self, values: Sequence):
+        self.writer.writerow(values)
+        self.digest.update(repr(tuple(values)).encode('utf-8'))
+        self.row_count += 1
+
+    def writerows(self, rows: List[Sequence]):
+        self.writer.writerows(rows)
+        for values in rows:
+            self.digest.update(repr(tuple(values)).encode('utf-8'))
+        self.row_count += len(rows)
+
+    def close(self):
+        self.finish()
+        self.commit()
+
+    def finish(self):
+        """Complete the temp file without replacing the output yet."""
+        self.finished = True
+        try:
+            self.writer.close()
+        except BaseException:
+            self._discard()
+            raise
+        if (self.hash_store and os.path.exists(self.output_file)
+                and self.hash_store.get(self.output_file) == self.digest.hexdigest()):
+            self.unchanged = True
+            self._discard()
+
+    def commit(self):
+        """Move the finished temp file over the output file."""
+        if self.unchanged:
+            return
+        os.replace(self.tmp_file, self.output_file)
+        if self.hash_store:
+            self.hash_store.put(self.output_file, self.digest.hexdigest(), self.row_count)
+
+    def abort(self):
+        if not self.finished:
+            self.finished = True
+            self.writer.abort()
+        self._discard()
+
+    def _discard(self):
+        try:
+            os.remove(self.tmp_file)
+        except FileNotFoundError:
+            pass
+
+
+def _cell_text(value) -> str:
+    """Render a value read back from a Parquet output as the text Alma sends for it."""
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        # Decimals come back padded to PARQUET_DECIMAL_SCALE places
+        return format(value.normalize(), 'f')
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def read_output_rows(output_format: str, output_file: str) -> Iterator[Sequence]:
+    """Yield the rows of an existing output file, heading row first."""
+    if output_format == 'parquet':
+        parquet_file = pq.ParquetFile(output_file)
+        try:
+            yield [field.name for field in parquet_file.schema_arrow]
+            for batch in parquet_file.iter_batches():
+                for row in zip(*(column.to_pylist() for column in batch.columns)):
+                    yield tuple(_cell_text(value) for value in row)
+        finally:
+            parquet_file.close()
+    elif output_format == 'xlsx':
+        wb = openpyxl.load_workbook(output_file, read_only=True)
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
+    else:
+        base_format, compression = split_format(output_format)
+        with open(output_file, 'rb') as raw:
+            stream = decompress_stream(raw, compression) if compression else raw
+            with io.TextIOWrapper(stream, encoding='utf-8', newline='') as f:
+                yield from csv.reader(f, delimiter='\t' if base_format == 'tsv' else ',')
+
+
+def read_output_headings(output_format: str, output_file: str) -> Optional[List]:
+    """Return the heading row of an existing output file, or None if it cannot be read."""
+    try:
+        rows = read_output_rows(output_format, output_file)
+        try:
+            return list(next(rows, []))
+        finally:
+            rows.close()
+    except Exception:
+        return None
+
+
+class MergingOutput:
+    """
+    Writer for incremental runs. The rows written to it are held by key, and
+    on close they are merged into the existing output: a row whose key is
+    already in the file replaces it in place, other rows are appended. The
+    merged file is written through AtomicOutput; a ``cancel_token`` is
+    checked while the existing rows are copied.
+    """
+
+    def __init__(
+        self,
+        output_format: str,
+        headers: Dict[str, str],
+        output_file: str,
+        key_column: str,
+        hash_store: Optional[OutputHashStore] = None,
+        column_types: Optional[Dict[str, str]] = None,
+        compression_level: Optional[int] = None,
+        cancel_token: Optional[CancelToken] = None,
+        logger: Optional[logging.Logger] = None
+    ):
+        headings = list(headers.values())
+        if key_column in headings:
+            self.key_index = headings.index(key_column)
+        elif key_column in headers:
+            self.key_index = list(headers).index(key_column)
+        else:
+            raise ValueError(f"Incremental key column '{key_column}' is not in the report")
+        # Keys are compared as values of the schema type; see key_text
+        self.key_kind = column_kind((column_types or {}).get(list(headers)[self.key_index]))
+        self.output_format = output_format
+        self.headers = headers
+        self.output_file = output_file
+        self.hash_store = hash_store
+        self.column_types = column_types
+        self.compression_level = compression_level
+        self.cancel_token = cancel_token
+        self.logger = logger
+        self.rows: Dict[str, Sequence] = {}
+        self.output: Optional[AtomicOutput] = None
+        self.row_count = 0
+        self.updated = 0
+        self.added = 0
+        self.unchanged = False
+
+    def _key(self, values: Sequence) -> str:
+        return key_text(values[self.key_index], self.key_kind)
+
+    def writerow(self, values: Sequence):
+        self.rows[self._key(values)] = values
+
+    def writerows(self, rows: Iterable[Sequence]):
+        for values in rows:
+            self.rows[self._key(values)] = values
+
+    def close(self):
+        self.finish()
+        self.commit()
+
+    def finish(self):
+        """Write the merged temp file without replacing the output yet."""
+        self.output = output = AtomicOutput(self.output_format, self.headers, self.output_file, self.hash_store,
+                                            self.column_types, self.compression_level, self.logger)
+        existing = read_output_rows(self.output_format, self.output_file)
+        try:
+            next(existing, None)  # heading row
+            for i, row in enumerate(existing):
+                if self.cancel_token and i % CANCEL_CHECK_ROWS == 0:
+                    self.cancel_token.check()
+                new_row = self.rows.pop(self._key(row), None)
+                if new_row is not None:
+                    self.updated += 1
+                output.writerow(row if new_row is None else new_row)
+            self.added = len(self.rows)
+            for row in self.rows.values():
+                output.writerow(row)
+        except BaseException:
+            output.abort()
+            raise
+        finally:
+            existing.close()
+        output.finish()
+        self.row_count = output.row_count
+        self.unchanged = output.unchanged
+
+    def commit(self):
+        self.output.commit()
+
+    def abort(self):
+        self.rows.clear()
+        if self.output:
+            self.output.abort()
+
+
+class TeeOutput:
+    """
+    Writes the same rows to several outputs (AtomicOutput or MergingOutput),
+    so a task with more than one OUTPUT_FORMAT is fetched once. The outputs
+    are all or nothing: every temp file is finished before any is moved into
+    place, and if one fails all of them are discarded and the task fails.
+    """
+
+    def __init__(self, outputs: List):
+        self.outputs = outputs
+
+    def writerow(self, values: Sequence):
+        for output in self.outputs:
+            output.writerow(values)
+
+    def writerows(self, rows: List[Sequence]):
+        for output in self.outputs:
+            output.writerows(rows)
+
+    def close(self):
+        try:
+            for output in self.outputs:
+                output.finish()
+        except BaseException:
+            self.abort()
+            raise
+        for output in self.outputs:
+            output.commit()
+
+    def abort(self):
+        for output in self.outputs:
+            output.abort()
+
+
+def output_targets(output_format, output_file: str) -> List[Tuple[str, str]]:
+    """
+    Expand a task's OUTPUT_FORMAT, a format or a list of formats, into
+    (format, file name) pairs. With several formats each file is
+    OUTPUT_FILE_NAME with its extension replaced by the format, e.g.
+    "loans.xlsx" with ["xlsx", "csv.gz"] gives loans.xlsx and loans.csv.gz.
+    """
+    formats = [output_format] if isinstance(output_format, str) else output_format
+    formats = list(dict.fromkeys(f.lower() for f in formats))
+    if not formats:
+        raise ValueError("OUTPUT_FORMAT lists no formats")
+    if len(formats) == 1:
+        return [(formats[0], output_file)]
+    stem = output_file
+    for known in sorted(OUTPUT_FORMATS, key=len, reverse=True):
+        if stem.lower().endswith(f".{known}"):
+            stem = stem[:-len(known) - 1]
+            break
+    return [(f, f"{stem}.{f}") for f in formats]
+
+
+def open_outputs(
+    targets: List[Tuple[str, str]],
+    headers: Dict[str, str],
+    hash_store: Optional[OutputHashStore] = None,
+    merge_key: Optional[str] = None,
+    column_types: Optional[Dict[str, str]] = None,
+    compression_level: Optional[int] = None,
+    cancel_token: Optional[CancelToken] = None,
+    logger: Optional[logging.Logger] = None
+) -> TeeOutput:
+    """
+    Open an AtomicOutput (or with ``merge_key`` a MergingOutput) for each
+    (format, file) target and return them as one TeeOutput.
+    """
+    outputs = []
+    try:
+        for output_format, output_file in targets:
+            if merge_key:
+                outputs.append(MergingOutput(output_format, headers, output_file, merge_key, hash_store,
+                                             column_types, compression_level, cancel_token, logger))
+            else:
+                outputs.append(AtomicOutput(output_format, headers, output_file, hash_store,
+                                            column_types, compression_level, logger))
+    except BaseException:
+        for output in outputs:
+            output.abort()
+        raise
+    return TeeOutput(outputs)
@@ -1,10 +1,19 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from core.config_manager import ConfigManager
 from core.job_manager import JobManager
+from core.job_queue import JobQueue
+from core.job_events import JobEventBroker
+from core.async_alma_fetcher import create_async_client
+from core.schema_cache import SchemaCache
+from core.output_hashes import OutputHashStore
+from core.incremental import WatermarkStore
+from core.rate_governor import RateGovernor
+from core.log_index import LogIndex
 from api.routes import tasks, reports, logs
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -16,13 +25,53 @@ CONFIG_PATH = os.environ.get(
 
 FRONTEND_DIR = os.path.join(BASE_DIR, "frontend", "dist")
 
+HTTP_POOL_SIZE = int(os.environ.get("ALMA_HTTP_POOL_SIZE", "10"))
+MAX_CONCURRENT_REPORTS = int(os.environ.get("ALMA_MAX_CONCURRENT_REPORTS", "4"))
+JOB_QUEUE_SIZE = int(os.environ.get("ALMA_JOB_QUEUE_SIZE", "100"))
+JOB_EVENT_INTERVAL = float(os.environ.get("ALMA_JOB_EVENT_INTERVAL", "0.5"))
+MAX_REQUESTS_PER_SECOND = float(os.environ.get("ALMA_MAX_RPS", "20"))
+DAILY_QUOTA_RESERVE = int(os.environ.get("ALMA_DAILY_QUOTA_RESERVE", "0"))
+MAX_RETRIES = int(os.environ.get("ALMA_MAX_RETRIES", "4"))
+RETRY_BACKOFF = float(os.environ.get("ALMA_RETRY_BACKOFF", "2"))
+SCHEMA_CACHE_DIR = os.environ.get("ALMA_SCHEMA_CACHE_DIR")
+SCHEMA_CACHE_TTL = int(os.environ.get("ALMA_SCHEMA_CACHE_TTL", "86400"))
+CHECKPOINT_DIR = os.environ.get("ALMA_CHECKPOINT_DIR")
+OUTPUT_HASHES_PATH = os.environ.get("ALMA_OUTPUT_HASHES", os.path.join(BASE_DIR, "output_hashes.json"))
+WATERMARKS_PATH = os.environ.get("ALMA_WATERMARKS", os.path.join(BASE_DIR, "watermarks.json"))
+JOBS_DB_PATH = os.environ.get("ALMA_JOBS_DB", os.path.join(BASE_DIR, "jobs.db"))
+JOB_RETENTION_DAYS = int(os.environ.get("ALMA_JOB_RETENTION_DAYS", "90"))
+
 config_manager = ConfigManager(CONFIG_PATH)
-job_manager = JobManager()
+# Job changes are pushed to /reports/jobs/events streams, at most one batch per interval each
+job_events = JobEventBroker(JOB_EVENT_INTERVAL)
+job_manager = JobManager(JOBS_DB_PATH or ":memory:", retention_days=JOB_RETENTION_DAYS, events=job_events)
+# Every Alma request made by this process is throttled by one governor
+rate_governor = RateGovernor(MAX_REQUESTS_PER_SECOND, daily_reserve=DAILY_QUOTA_RESERVE)
+# Keep-alive connection pool shared by every report run by this process
+http_client = create_async_client(pool_maxsize=HTTP_POOL_SIZE, governor=rate_governor)
+schema_cache = SchemaCache(SCHEMA_CACHE_DIR, SCHEMA_CACHE_TTL) if SCHEMA_CACHE_DIR else None
+output_hash_store = OutputHashStore(OUTPUT_HASHES_PATH) if OUTPUT_HASHES_PATH else None
+watermark_store = WatermarkStore(WATERMARKS_PATH)
+# Log directory listings, refreshed when a directory changes
+log_index = LogIndex()
+# Runs are queued by priority and fetched by a fixed number of workers
+job_queue = JobQueue(job_manager, workers=MAX_CONCURRENT_REPORTS, maxsize=JOB_QUEUE_SIZE)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    await http_client.aclose()
+    job_manager.close()
+
 
 app = FastAPI(
     title="Alma Analytics Report Fetcher",
     description="API for managing and running Alma Analytics reports",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
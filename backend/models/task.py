@@ -1,18 +1,25 @@
 from pydantic import BaseModel
-from typing import Literal, Optional
+from typing import List, Literal, Optional, Union
 
 
 class TaskBase(BaseModel):
     alma_report_path: str
     output_path: str
     output_file_name: str
-    output_format: str = "xlsx"
+    output_format: Union[str, List[str]] = "xlsx"
     log_dir: str
     test_output_path: Optional[str] = None
     test_log_dir: Optional[str] = None
     test_row_limit: int = 25
     frequency: Optional[Literal["daily", "weekly"]] = "daily"
     active: bool = True
+    incremental_date_column: Optional[str] = None
+    incremental_key_column: Optional[str] = None
+    incremental_lookback_days: int = 1
+    compression_level: Optional[int] = None
+    priority: int = 0
+    log_compress_after_days: Optional[int] = None
+    log_delete_after_days: Optional[int] = None
 
 
 class TaskCreate(TaskBase):
@@ -0,0 +1,57 @@
+import httpx
+
+# (column, xsd type, heading) of the fake report
+COLUMNS = [('Column0', 'xsd:string', 'Loan ID'), ('Column1', 'xsd:decimal', 'Fine')]
+
+SCHEMA = (
+    '<xsd:schema xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:saw-sql="urn:saw-sql" '
+    'targetNamespace="urn:schemas-microsoft-com:xml-analysis:rowset">'
+    '<xsd:complexType name="Row"><xsd:sequence>'
+    + ''.join(f'<xsd:element name="{name}" type="{xsd_type}" saw-sql:columnHeading="{heading}"/>'
+              for name, xsd_type, heading in COLUMNS)
+    + '</xsd:sequence></xsd:complexType></xsd:schema>'
+)
+
+
+class FakeAlma:
+    """
+    Stand-in for the Analytics reports API serving ``rows`` in pages of
+    ``page_size``. Like Alma, the first page carries the schema and a
+    ResumptionToken that later requests send back. ``errors`` maps the
+    number of a request (1-based) to the HTTP status it fails with.
+    """
+
+    def __init__(self, rows, page_size=2, errors=None):
+        self.rows = rows
+        self.page_size = page_size
+        self.errors = errors or {}
+        self.requests = 0
+        self._cursors = {}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.requests in self.errors:
+            return httpx.Response(self.errors[self.requests], text="Service unavailable")
+        token = request.url.params.get('token')
+        if token and token not in self._cursors:
+            return httpx.Response(400, text="INVALID_TOKEN")
+        offset = self._cursors.get(token, 0)
+        end = min(offset + self.page_size, len(self.rows))
+        new_token = token or f"token{self.requests}"
+        self._cursors[new_token] = end
+
+        parts = ['<QueryResult>']
+        if not token:
+            parts.append(f'<ResumptionToken>{new_token}</ResumptionToken>')
+        parts.append(f'<IsFinished>{"true" if end >= len(self.rows) else "false"}</IsFinished><ResultXml>'
+                     '<rowset xmlns="urn:schemas-microsoft-com:xml-analysis:rowset">')
+        if not token:
+            parts.append(SCHEMA)
+        for row in self.rows[offset:end]:
+            cells = ''.join(f'<{name}>{value}</{name}>' for (name, _, _), value in zip(COLUMNS, row))
+            parts.append(f'<Row>{cells}</Row>')
+        parts.append('</rowset></ResultXml></QueryResult>')
+        return httpx.Response(200, json={'anies': [''.join(parts)]})
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.async_alma_fetcher import AsyncAlmaFetcher  # noqa: E402
+from core.checkpoint import Checkpoint  # noqa: E402
+from core.retry import AlmaAPIError, RetryPolicy  # noqa: E402
+from core.writers import AtomicOutput, read_output_rows  # noqa: E402
+from fake_alma import FakeAlma  # noqa: E402
+
+ROWS = [(f'L{i}', f'{i}.50') for i in range(5)]
+
+
+class CheckpointResumeTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.config = {'ALMA_REPORT_PATH': '/shared/Loans', 'OUTPUT_PATH': self.dir.name,
+                       'OUTPUT_FILE_NAME': 'loans.csv', 'OUTPUT_FORMAT': 'csv'}
+        self.output_file = os.path.join(self.dir.name, 'loans.csv')
+        self.checkpoint_dir = os.path.join(self.dir.name, 'checkpoints')
+
+    def checkpoint(self):
+        return Checkpoint(self.checkpoint_dir, 'loans', self.config['ALMA_REPORT_PATH'])
+
+    async def run_report(self, alma):
+        async with alma.client() as client:
+            fetcher = AsyncAlmaFetcher('key', client, retry=RetryPolicy(0))
+            return await fetcher.run_report(self.config, checkpoint=self.checkpoint())
+
+    async def test_failed_fetch_resumes_from_last_saved_page(self):
+        # Three pages; the request for the second fails
+        alma = FakeAlma(ROWS, errors={2: 503})
+        with self.assertRaises(AlmaAPIError), self.assertLogs(level='ERROR'):
+            await self.run_report(alma)
+        self.assertFalse(os.path.exists(self.output_file))
+        self.assertEqual(self.checkpoint().load()['rows'], 2)
+
+        requests_before = alma.requests
+        _, row_count = await self.run_report(alma)
+
+        # Only the second and third pages are requested again
+        self.assertEqual(alma.requests - requests_before, 2)
+        self.assertEqual(row_count, 5)
+        self.assertEqual(list(read_output_rows('csv', self.output_file))[1:], [list(row) for row in ROWS])
+        self.assertIsNone(self.checkpoint().load())
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    async def test_checkpoint_is_kept_when_the_output_cannot_be_written(self):
+        with mock.patch.object(AtomicOutput, 'commit', side_effect=OSError("Disk full")):
+            with self.assertRaises(OSError):
+                await self.run_report(FakeAlma(ROWS))
+        self.assertFalse(os.path.exists(self.output_file))
+        self.assertEqual(self.checkpoint().load()['rows'], 5)
+
+    def test_rows_appended_after_the_last_saved_state_are_dropped(self):
+        checkpoint = self.checkpoint()
+        checkpoint.start({'Column0': 'Loan ID', 'Column1': 'Fine'})
+        checkpoint.save_page('token1', ROWS[:2])
+        # The run died after spilling a page but before saving its state
+        with open(checkpoint.spill_file, 'ab') as f:
+            f.write(b'["L2", "2.50"]\n')
+
+        state = self.checkpoint().load()
+        self.assertEqual((state['token'], state['rows']), ('token1', 2))
+        self.assertEqual(list(self.checkpoint().replay()), ROWS[:2])
+
+    def test_checkpoint_for_another_filter_is_discarded(self):
+        checkpoint = self.checkpoint()
+        checkpoint.start({'Column0': 'Loan ID'}, report_filter='<sawx:expr/>')
+        checkpoint.save_page('token1', ROWS[:2])
+
+        self.assertIsNone(self.checkpoint().load())
+        self.assertFalse(os.path.exists(checkpoint.state_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.job_manager import JobManager  # noqa: E402
+from models.job import JobStatus  # noqa: E402
+
+
+class JobManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.db_path = os.path.join(self.dir.name, 'jobs.db')
+
+    def open(self, **kwargs) -> JobManager:
+        job_manager = JobManager(self.db_path, **kwargs)
+        self.addCleanup(job_manager.close)
+        return job_manager
+
+    def test_pages_follow_on_from_before(self):
+        job_manager = self.open()
+        jobs = [job_manager.create_job(f'task{i % 2}') for i in range(7)]
+        for job in jobs[:5]:
+            job_manager.complete_job(job.id, 'out.csv', 1)
+        newest_first = [job.id for job in reversed(jobs)]
+
+        pages, before = [], None
+        while True:
+            page = job_manager.list_jobs(3, before=before)
+            if not page:
+                break
+            pages.append([job.id for job in page])
+            before = page[-1].id
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), newest_first)
+        # Active jobs come from memory, finished ones from the database
+        self.assertEqual([job.status for job in job_manager.list_jobs(3)],
+                         [JobStatus.PENDING, JobStatus.PENDING, JobStatus.COMPLETED])
+
+    def test_pages_can_be_filtered_by_task_and_status(self):
+        job_manager = self.open()
+        jobs = [job_manager.create_job(f'task{i % 2}') for i in range(6)]
+        job_manager.fail_job(jobs[4].id, 'HTTP 400')
+
+        task1 = [job.id for job in reversed(jobs) if job.task_name == 'task1']
+        first = job_manager.list_jobs(2, task_name='task1')
+        rest = job_manager.list_jobs(2, before=first[-1].id, task_name='task1')
+        self.assertEqual([job.id for job in first + rest], task1)
+
+        failed = job_manager.list_jobs(10, status=JobStatus.FAILED)
+        self.assertEqual([job.id for job in failed], [jobs[4].id])
+
+    def test_jobs_left_active_by_a_restart_are_failed(self):
+        job_manager = self.open()
+        running = job_manager.create_job('loans')
+        job_manager.update_job_status(running.id, JobStatus.RUNNING)
+        pending = job_manager.create_job('fines')
+        completed = job_manager.create_job('items')
+        job_manager.complete_job(completed.id, 'items.csv', 3)
+        job_manager.close()
+
+        restarted = self.open()
+        for job_id in (running.id, pending.id):
+            job = restarted.get_job(job_id)
+            self.assertEqual(job.status, JobStatus.FAILED)
+            self.assertEqual(job.error_message, "Interrupted by a server restart")
+            self.assertIsNotNone(job.completed_at)
+        self.assertEqual(restarted.get_job(completed.id).status, JobStatus.COMPLETED)
+        self.assertEqual(restarted.active_jobs(), [])
+
+    def test_old_finished_jobs_are_pruned(self):
+        job_manager = self.open(retention_days=30)
+        old = job_manager.create_job('loans')
+        job_manager.complete_job(old.id, 'loans.csv', 1)
+        active = job_manager.create_job('loans')
+        with job_manager.lock:
+            job_manager._db.execute("UPDATE jobs SET started_at = ?",
+                                    ((datetime.now() - timedelta(days=31)).isoformat(timespec='microseconds'),))
+            job_manager._db.commit()
+
+        self.assertEqual(job_manager.prune(), 1)
+        self.assertIsNone(job_manager.get_job(old.id))
+        self.assertIsNotNone(job_manager.get_job(active.id))
+
+    def test_finished_job_is_not_overwritten(self):
+        job_manager = self.open()
+        job = job_manager.create_job('loans')
+        self.assertTrue(job_manager.cancel_job(job.id))
+
+        job_manager.complete_job(job.id, 'loans.csv', 10)
+        job_manager.fail_job(job.id, 'late failure')
+
+        self.assertEqual(job_manager.get_job(job.id).status, JobStatus.CANCELLED)
+        self.assertFalse(job_manager.cancel_job(job.id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+from api.routes import reports  # noqa: E402
+from core.job_manager import JobManager  # noqa: E402
+from core.job_queue import DuplicateJobError, JobQueue, QueueFullError  # noqa: E402
+from models.job import JobCreate, JobStatus  # noqa: E402
+
+
+class FakeConfigManager:
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+    def get_raw_task_config(self, task_name):
+        return self.tasks.get(task_name)
+
+
+class JobQueueTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.job_manager = JobManager()
+        self.addCleanup(self.job_manager.close)
+
+    async def start_queue(self, workers=1, maxsize=10):
+        queue = JobQueue(self.job_manager, workers=workers, maxsize=maxsize)
+        queue.start()
+        self.addAsyncCleanup(queue.stop)
+        return queue
+
+    async def complete(self, job_id):
+        self.job_manager.complete_job(job_id, '', 0)
+
+    async def test_higher_priority_jobs_start_first(self):
+        queue = await self.start_queue()
+        started = []
+
+        async def run(job_id):
+            started.append(self.job_manager.get_job(job_id).task_name)
+            self.job_manager.complete_job(job_id, '', 0)
+
+        # Nothing runs until the test yields to the loop, so all four are queued together
+        for task_name, priority in (('low', 0), ('high', 5), ('mid', 1), ('low2', 0)):
+            queue.submit(task_name, False, run, priority=priority)
+        await queue._queue.join()
+
+        self.assertEqual(started, ['high', 'mid', 'low', 'low2'])
+
+    async def test_second_job_for_an_active_task_is_rejected(self):
+        queue = await self.start_queue()
+
+        job = queue.submit('loans', False, self.complete)
+        with self.assertRaises(DuplicateJobError) as raised:
+            queue.submit('loans', False, self.complete)
+        self.assertIs(raised.exception.job, job)
+        # Test and production runs of a task are separate
+        queue.submit('loans', True, self.complete)
+
+        await queue._queue.join()
+        queue.submit('loans', False, self.complete)
+
+    async def test_full_queue_is_rejected(self):
+        queue = await self.start_queue(maxsize=2)
+
+        queue.submit('a', False, self.complete)
+        queue.submit('b', False, self.complete)
+        with self.assertRaises(QueueFullError):
+            queue.submit('c', False, self.complete)
+
+    async def test_run_report_maps_queue_errors_to_status_codes(self):
+        # No workers, so submitted jobs stay queued
+        queue = await self.start_queue(workers=0, maxsize=1)
+        task_config = {'ALMA_REPORT_PATH': '/shared/Report'}
+        config_manager = FakeConfigManager({'a': task_config, 'b': task_config})
+
+        async def submit(task_name):
+            return await reports.run_report(JobCreate(task_name=task_name), config_manager=config_manager,
+                                            job_manager=self.job_manager, job_queue=queue, http_client=None)
+
+        await submit('a')
+        with self.assertRaises(HTTPException) as raised:
+            await submit('a')
+        self.assertEqual(raised.exception.status_code, 409)
+        with self.assertRaises(HTTPException) as raised:
+            await submit('b')
+        self.assertEqual(raised.exception.status_code, 503)
+
+    async def test_job_whose_run_raises_is_failed(self):
+        queue = await self.start_queue()
+
+        async def run(job_id):
+            raise PermissionError("Permission denied: '/proc/nope/logs'")
+
+        job = queue.submit('loans', False, run)
+        with self.assertLogs('core.job_queue', 'ERROR'):
+            await queue._queue.join()
+
+        failed = self.job_manager.get_job(job.id)
+        self.assertEqual(failed.status, JobStatus.FAILED)
+        self.assertIn('/proc/nope/logs', failed.error_message)
+        # The task is no longer blocked by the failed job
+        queue.submit('loans', False, self.complete)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from api.routes import logs  # noqa: E402
+from core import log_files  # noqa: E402
+from core.log_files import apply_log_retention, compress_log, log_size, read_lines_before, read_log_text  # noqa: E402
+
+LINES = [f"2026-03-02 12:00:{i:02d} - INFO - Fetched {i * 1000} rows...\n" for i in range(10)]
+TEXT = ''.join(LINES)
+
+
+class ReadLinesBeforeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        # Small blocks, so a tail takes several backward reads
+        patcher = mock.patch.object(log_files, 'TAIL_BLOCK_SIZE', 16)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_log(self, text=TEXT, name='download_analytics_log_loans_20260302_120000.log'):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def page_back(self, path, lines):
+        """Every page from the end of the log to its start."""
+        pages, before = [], None
+        while before != 0:
+            text, before, end = read_lines_before(path, before, lines)
+            pages.append((text, before, end))
+        return pages
+
+    def test_tail_returns_the_last_lines(self):
+        path = self.write_log()
+
+        text, start, end = read_lines_before(path, None, 3)
+
+        self.assertEqual(text, ''.join(LINES[-3:]))
+        self.assertEqual((start, end), (len(TEXT) - len(text), len(TEXT)))
+
+    def test_before_pages_back_to_the_start(self):
+        path = self.write_log()
+
+        pages = self.page_back(path, 4)
+
+        self.assertEqual([text for text, _, _ in pages], [''.join(LINES[6:]), ''.join(LINES[2:6]), ''.join(LINES[:2])])
+        # Each page ends where the next one starts
+        self.assertEqual([end for _, _, end in pages[1:]], [start for _, start, _ in pages[:-1]])
+
+    def test_last_line_without_newline_is_returned(self):
+        path = self.write_log(TEXT + "Finished")
+
+        text, _, _ = read_lines_before(path, None, 2)
+
+        self.assertEqual(text, LINES[-1] + "Finished")
+
+    def test_gzipped_log_pages_like_the_plain_one(self):
+        plain = self.write_log()
+        expected = self.page_back(plain, 3)
+        compressed = compress_log(self.write_log(name='download_analytics_log_loans_20260301_120000.log'))
+
+        self.assertTrue(compressed.endswith('.log.gz'))
+        self.assertEqual(self.page_back(compressed, 3), expected)
+        self.assertEqual(log_size(compressed), len(TEXT))
+
+    def test_whole_log_up_to_an_offset(self):
+        compressed = compress_log(self.write_log())
+        end = len(''.join(LINES[:4]))
+
+        self.assertEqual(read_log_text(compressed), (TEXT, len(TEXT)))
+        self.assertEqual(read_log_text(compressed, end), (''.join(LINES[:4]), end))
+
+
+class LogRetentionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write_log(self, name, age_days):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(TEXT)
+        mtime = time.time() - age_days * 86400
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_old_logs_are_compressed_and_older_ones_deleted(self):
+        self.write_log('download_analytics_log_loans_20260101_120000.log', 40)
+        self.write_log('download_analytics_log_loans_20260201_120000.log', 10)
+        self.write_log('download_analytics_log_loans_20260302_120000.log', 0)
+        # Another task sharing the directory is left alone
+        self.write_log('download_analytics_log_fines_20260201_120000.log', 10)
+
+        self.assertEqual(apply_log_retention(self.dir.name, 'loans', 7, 30), (1, 1))
+        self.assertEqual(sorted(os.listdir(self.dir.name)), [
+            'download_analytics_log_fines_20260201_120000.log',
+            'download_analytics_log_loans_20260201_120000.log.gz',
+            'download_analytics_log_loans_20260302_120000.log',
+        ])
+
+    def test_empty_task_name_selects_whole_run_logs(self):
+        self.write_log('download_analytics_log_20260201_120000.log', 10)
+        self.write_log('download_analytics_log_loans_20260201_120000.log', 10)
+
+        self.assertEqual(apply_log_retention(self.dir.name, '', delete_after_days=7), (0, 1))
+        self.assertEqual(os.listdir(self.dir.name), ['download_analytics_log_loans_20260201_120000.log'])
+
+
+class ReadLogFileRouteTest(unittest.TestCase):
+
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(logs.router)
+        self.client = TestClient(app)
+
+    def test_negative_offsets_are_rejected(self):
+        for params in ({'tail': -1}, {'before': -5}):
+            response = self.client.get('/logs/loans/download_analytics_log_loans_20260302_120000.log', params=params)
+            self.assertEqual(response.status_code, 422, params)
+        response = self.client.get('/logs/loans/download_analytics_log_loans_20260302_120000.log/follow',
+                                   params={'offset': -1})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import datetime
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import rate_governor  # noqa: E402
+from core.rate_governor import QUOTA_PROBE_INTERVAL, QuotaExhaustedError, RateGovernor  # noqa: E402
+
+# 2026-03-02 12:00 UTC
+NOON = datetime.datetime(2026, 3, 2, 12, tzinfo=datetime.timezone.utc).timestamp()
+
+
+class FakeClock:
+    """Replaces the time module in core.rate_governor; both clocks advance together."""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class RateGovernorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(NOON)
+        patcher = mock.patch.object(rate_governor, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_requests_beyond_the_burst_wait_for_tokens(self):
+        governor = RateGovernor(rate_per_second=2)
+
+        self.assertEqual([governor._reserve() for _ in range(4)], [0, 0, 0.5, 1.0])
+        self.clock.advance(0.5)
+        # The refill only pays off part of the tokens already owed
+        self.assertEqual(governor._reserve(), 1.0)
+        self.clock.advance(10)
+        self.assertEqual(governor._reserve(), 0)
+        self.assertEqual(governor.stats()['waited_seconds'], 2.5)
+
+    def test_429_pauses_every_caller_for_retry_after(self):
+        governor = RateGovernor(rate_per_second=10)
+        governor.observe(429, {'Retry-After': '3'})
+
+        self.assertEqual(governor._reserve(), 3)
+        self.clock.advance(2)
+        self.assertEqual(governor._reserve(), 1)
+        self.assertEqual(governor.stats()['throttled'], 1)
+
+    def test_requests_stop_at_the_daily_quota_reserve(self):
+        governor = RateGovernor(daily_reserve=10)
+        governor.observe(200, {'X-Exl-Api-Remaining': '11'})
+        governor._reserve()
+        governor.observe(200, {'X-Exl-Api-Remaining': '10'})
+
+        with self.assertRaises(QuotaExhaustedError):
+            governor._reserve()
+
+    def test_one_probe_is_let_through_per_interval_once_the_quota_is_spent(self):
+        governor = RateGovernor(daily_reserve=10)
+        governor.observe(200, {'X-Exl-Api-Remaining': '10'})
+
+        self.clock.advance(QUOTA_PROBE_INTERVAL)
+        governor._reserve()
+        with self.assertRaises(QuotaExhaustedError):
+            governor._reserve()
+
+        # The probe's response shows the quota was raised
+        governor.observe(200, {'X-Exl-Api-Remaining': '5000'})
+        governor._reserve()
+
+    def test_quota_resets_at_midnight_utc(self):
+        governor = RateGovernor(daily_reserve=10)
+        governor.observe(200, {'X-Exl-Api-Remaining': '0'})
+        self.clock.advance(11.5 * 3600)
+        # A probe, which finds the quota still spent
+        governor._reserve()
+        governor.observe(200, {'X-Exl-Api-Remaining': '0'})
+        with self.assertRaises(QuotaExhaustedError):
+            governor._reserve()
+
+        self.clock.advance(0.5 * 3600)
+        governor._reserve()
+        governor._reserve()
+        self.assertIsNone(governor.daily_remaining)
+
+
+if __name__ == '__main__':
+    unittest.main()
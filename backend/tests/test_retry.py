@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.async_alma_fetcher import AsyncAlmaFetcher  # noqa: E402
+from core.retry import AlmaAPIError, RetryPolicy  # noqa: E402
+from core.writers import read_output_rows  # noqa: E402
+from fake_alma import FakeAlma  # noqa: E402
+
+ROWS = [(f'L{i}', f'{i}.50') for i in range(5)]
+
+
+class RetryTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.config = {'ALMA_REPORT_PATH': '/shared/Loans', 'OUTPUT_PATH': self.dir.name,
+                       'OUTPUT_FILE_NAME': 'loans.csv', 'OUTPUT_FORMAT': 'csv'}
+        self.output_file = os.path.join(self.dir.name, 'loans.csv')
+
+    async def run_report(self, alma, retry):
+        async with alma.client() as client:
+            return await AsyncAlmaFetcher('key', client, retry=retry).run_report(self.config)
+
+    async def test_failed_page_is_retried_with_the_same_token(self):
+        retry = RetryPolicy(2, backoff_base=0)
+        with self.assertLogs(level='WARNING'):
+            _, row_count = await self.run_report(FakeAlma(ROWS, errors={2: 503, 3: 500}), retry)
+
+        self.assertEqual(row_count, 5)
+        self.assertEqual(list(read_output_rows('csv', self.output_file))[1:], [list(row) for row in ROWS])
+        self.assertEqual((retry.attempts, retry.retries), (5, 2))
+
+    async def test_report_fails_once_retries_run_out(self):
+        retry = RetryPolicy(2, backoff_base=0)
+        with self.assertRaises(AlmaAPIError) as raised, self.assertLogs(level='WARNING'):
+            await self.run_report(FakeAlma(ROWS, errors={2: 503, 3: 503, 4: 503}), retry)
+
+        self.assertIsNone(raised.exception.status_code)
+        self.assertIn('after 3 attempts', str(raised.exception))
+        self.assertEqual(retry.attempts, 4)
+        # Nothing truncated is left in place of the output
+        self.assertEqual(os.listdir(self.dir.name), [])
+
+    async def test_non_retryable_error_fails_at_once(self):
+        retry = RetryPolicy(2, backoff_base=0)
+        with self.assertRaises(AlmaAPIError) as raised, self.assertLogs(level='ERROR'):
+            await self.run_report(FakeAlma(ROWS, errors={2: 400}), retry)
+
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(retry.attempts, 2)
+
+    def test_backoff_is_capped(self):
+        retry = RetryPolicy(10, backoff_base=2, backoff_max=5)
+        for retry_number in range(1, 11):
+            self.assertLessEqual(retry.backoff(retry_number), min(5, 2 * 2 ** (retry_number - 1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
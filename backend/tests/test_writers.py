@@ -0,0 +1,93 @@
+import os
+import sys
+import datetime
+import tempfile
+import unittest
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.writers import AtomicOutput, MergingOutput, pq, read_output_rows  # noqa: E402
+
+HEADERS = {'Column0': 'Loan Date', 'Column1': 'Fine', 'Column2': 'Title'}
+COLUMN_TYPES = {'Column0': 'xsd:dateTime', 'Column1': 'xsd:decimal', 'Column2': 'xsd:string'}
+
+
+class MergingOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, output_file, rows):
+        output = AtomicOutput('xlsx', HEADERS, output_file, column_types=COLUMN_TYPES)
+        for row in rows:
+            output.writerow(row)
+        output.close()
+
+    def merge(self, output_file, key_column, rows):
+        output = MergingOutput('xlsx', HEADERS, output_file, key_column, column_types=COLUMN_TYPES)
+        for row in rows:
+            output.writerow(row)
+        output.close()
+        return output
+
+    def test_xlsx_merge_on_datetime_key_replaces_rows(self):
+        output_file = os.path.join(self.dir.name, 'loans.xlsx')
+        self.write(output_file, [('2024-01-01T10:00:05', '3.50', 'A'), ('2024-01-02T09:30:00', '1.00', 'B')])
+
+        merged = self.merge(output_file, 'Loan Date',
+                            [('2024-01-02T09:30:00', '2.00', 'B2'), ('2024-01-03T12:00:00', '0.50', 'C')])
+
+        self.assertEqual((merged.updated, merged.added), (1, 1))
+        rows = list(read_output_rows('xlsx', output_file))[1:]
+        self.assertEqual([row[2] for row in rows], ['A', 'B2', 'C'])
+
+    def test_xlsx_merge_on_decimal_key_replaces_rows(self):
+        output_file = os.path.join(self.dir.name, 'fines.xlsx')
+        self.write(output_file, [('2024-01-01T10:00:05', '3.50', 'A'), ('2024-01-02T09:30:00', '2.00', 'B')])
+
+        merged = self.merge(output_file, 'Fine', [('2024-01-05T08:00:00', '3.50', 'A2'), ('2024-01-05T08:00:00', '2', 'B2')])
+
+        self.assertEqual((merged.updated, merged.added), (2, 0))
+        rows = list(read_output_rows('xlsx', output_file))[1:]
+        self.assertEqual([row[2] for row in rows], ['A2', 'B2'])
+
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class ParquetOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.output_file = os.path.join(self.dir.name, 'fines.parquet')
+
+    def write(self, rows):
+        output = AtomicOutput('parquet', HEADERS, self.output_file, column_types=COLUMN_TYPES)
+        for row in rows:
+            output.writerow(row)
+        output.close()
+        return pq.read_table(self.output_file).to_pydict()
+
+    def test_decimals_are_stored_exactly(self):
+        table = self.write([('2024-01-01T10:00:05', '0.10', 'A'), ('2024-01-02T09:30:00', '1.123456789012', 'B')])
+
+        self.assertEqual(table['Fine'], [Decimal('0.1'), Decimal('1.1234567890')])
+        self.assertEqual([row[1] for row in read_output_rows('parquet', self.output_file)][1:], ['0.1', '1.123456789'])
+
+    def test_bad_cells_are_written_as_nulls(self):
+        with self.assertLogs(level='WARNING') as logs:
+            table = self.write([('2024-01-01T10:00:05', '3.50', 'A'), ('not a date', 'n/a', 'B'),
+                                ('2024-01-03T12:00:00', '', 'C')])
+
+        self.assertEqual(table['Loan Date'], [datetime.datetime(2024, 1, 1, 10, 0, 5), None,
+                                              datetime.datetime(2024, 1, 3, 12)])
+        self.assertEqual(table['Fine'], [Decimal('3.5'), None, None])
+        self.assertEqual(table['Title'], ['A', 'B', 'C'])
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("Column 'Fine': 1 values", logs.output[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,29 +4,50 @@ import json
 import argparse
 import logging
 import datetime
-import csv
-import openpyxl
+import time
 import xml.etree.ElementTree as ET
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote
 
+# Parsing, throttling, retries, checkpoints and outputs are shared with the web UI backend (backend/core)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from core.alma_fetcher import API_URL, make_row_parser, parse_column_types, parse_report_schema  # noqa: E402
+from core.checkpoint import Checkpoint  # noqa: E402
+from core.incremental import WatermarkStore, is_incremental, plan_incremental  # noqa: E402
+from core.log_files import apply_log_retention  # noqa: E402
+from core.output_hashes import OutputHashStore  # noqa: E402
+from core.rate_governor import RateGovernor  # noqa: E402
+from core.schema_cache import SchemaCache  # noqa: E402
+from core.retry import AlmaAPIError, RetryPolicy  # noqa: E402
+from core.writers import AtomicOutput, MergingOutput, output_targets, read_output_headings  # noqa: E402
 
-def setup_logging(log_dir, task_name=""):
+# (connect, read) timeouts for page requests; a hung request is retried like any other failure
+REQUEST_TIMEOUT = (10, 300)
+
+
+def setup_logging(log_dir, task_name="", compress_after_days=None, delete_after_days=None):
     """
-    Set up logging for a task. Creates a new log file for each task.
-    Falls back to console logging if file logging fails.
+    Set up logging for a task. Each task gets its own logger and its own log
+    file, so several tasks can run at the same time without touching each
+    other's handlers. Falls back to console logging if file logging fails.
+    The task's older logs are then compressed or deleted as configured.
 
     Args:
-        log_dir: Directory for log files
-        task_name: Name of the task (for error messages)
+        log_dir: Directory for log files (None to log to the console only)
+        task_name: Name of the task (used for the logger and log file names; "" for a batch)
+        compress_after_days: LOG_COMPRESS_AFTER_DAYS of the task
+        delete_after_days: LOG_DELETE_AFTER_DAYS of the task
 
     Returns:
-        str: Path to the log file, or None if file logging failed
+        tuple: (logger: logging.Logger, log_filename: str or None)
     """
-    logger = logging.getLogger()
+    logger = logging.getLogger(f"alma_reports.{task_name}" if task_name else "alma_reports")
     logger.setLevel(logging.DEBUG)
+    logger.propagate = False
 
-    # Remove any existing handlers (important for batch mode)
+    # Remove handlers left over from a previous run of the same task
     for handler in logger.handlers[:]:
         handler.close()
         logger.removeHandler(handler)
@@ -36,12 +57,17 @@ def setup_logging(log_dir, task_name=""):
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     logger.addHandler(console_handler)
+    if log_dir is None:
+        return logger, None
 
     # Try to set up file logging
     log_filename = None
     try:
         os.makedirs(log_dir, exist_ok=True)
-        log_filename = os.path.join(log_dir, f"download_analytics_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Tasks may share a LOG_DIR, so the task name keeps concurrent runs apart
+        prefix = f"download_analytics_log_{task_name}_" if task_name else "download_analytics_log_"
+        log_filename = os.path.join(log_dir, f"{prefix}{timestamp}.log")
         file_handler = logging.FileHandler(log_filename, encoding='utf-8')
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
@@ -49,10 +75,23 @@ def setup_logging(log_dir, task_name=""):
         print(f"Logging to: {log_filename}")
     except Exception as e:
         print(f"WARNING: Could not create log file in '{log_dir}': {e}")
-        print(f"Task '{task_name}' will only log to console.")
+        print(f"Task '{task_name}' will only log to console." if task_name else "The batch will only log to console.")
         log_filename = None
 
-    return log_filename
+    if log_filename:
+        try:
+            apply_log_retention(log_dir, task_name, compress_after_days, delete_after_days, logger)
+        except OSError as e:
+            logger.warning(f"Log retention failed in '{log_dir}': {e}")
+
+    return logger, log_filename
+
+
+def close_logging(logger):
+    """Close and detach all handlers of a task logger so its log file is released."""
+    for handler in logger.handlers[:]:
+        handler.close()
+        logger.removeHandler(handler)
 
 def generate_filename(output_path, output_file_name):
     '''
@@ -63,95 +102,437 @@ def generate_filename(output_path, output_file_name):
     filename, ext = os.path.splitext(output_file_name)
     return os.path.join(output_path, f"{filename}_{formatted_date}{ext}")
 
-def get_report_headers(api_key, report_path):
-    url = "https://api-eu.hosted.exlibrisgroup.com/almaws/v1/analytics/reports"
+
+class GovernedSession(requests.Session):
+    """Session whose requests all pass through a shared RateGovernor."""
+
+    def __init__(self, governor=None):
+        super().__init__()
+        self.governor = governor
+
+    def request(self, method, url, *args, **kwargs):
+        if self.governor:
+            self.governor.acquire()
+        resp = super().request(method, url, *args, **kwargs)
+        if self.governor:
+            self.governor.observe(resp.status_code, resp.headers)
+        return resp
+
+
+def create_session(pool_connections=1, pool_maxsize=10, governor=None):
+    """
+    Create an HTTP session with a keep-alive connection pool.
+
+    All page and header requests of a run go through one session, so the
+    TCP+TLS handshake to the Alma API is paid once per pooled connection
+    rather than once per request.
+
+    Args:
+        pool_connections: Number of per-host pools to keep
+        pool_maxsize: Maximum connections kept alive per host (should be >= --workers)
+        governor: RateGovernor that every request of the session waits on
+
+    Returns:
+        requests.Session
+    """
+    session = GovernedSession(governor)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def pool_stats(session):
+    """
+    Return connection reuse counters for a session created by create_session.
+
+    Returns:
+        dict: {'requests': int, 'connections': int}
+    """
+    stats = {'requests': 0, 'connections': 0}
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+    return stats
+
+
+def log_pool_stats(session, logger=None):
+    logger = logger or logging.getLogger()
+    stats = pool_stats(session)
+    logger.info(f"HTTP pool: {stats['requests']} requests over {stats['connections']} connections")
+
+
+def get_report_headers(api_key, report_path, logger=None, session=None, schema_cache=None):
+    logger = logger or logging.getLogger()
+    if schema_cache:
+        cached = schema_cache.get(report_path)
+        if cached:
+            logger.debug(f"get_report_headers using cached schema for {report_path}")
+            return cached
+    http = session or requests
+    url = API_URL
     headers = {"Authorization": f"apikey {api_key}", "Accept": "application/json"}
     params = {"path": unquote(report_path)}
     try:
-        logging.debug(f"get_report_headers Requesting: {url}")
-        logging.debug(f"get_report_headers Params: {params}")
-        logging.debug(f"get_report_headers Headers: {headers}")
-        resp = requests.get(url, headers=headers, params=params)
+        logger.debug(f"get_report_headers Requesting: {url}")
+        logger.debug(f"get_report_headers Params: {params}")
+        logger.debug(f"get_report_headers Headers: {headers}")
+        resp = http.get(url, headers=headers, params=params)
         if resp.status_code != 200:
-            logging.error(f"Failed to get headers: {resp.status_code}")
+            logger.error(f"Failed to get headers: {resp.status_code}")
             return {}
         xml = resp.json().get("anies", [None])[0]
         if not xml:
             return {}
         root = ET.fromstring(xml)
-        cols = {}
-        for e in root.findall(".//{http://www.w3.org/2001/XMLSchema}element"):
-            name = e.attrib.get("name")
-            heading = e.attrib.get("{urn:saw-sql}columnHeading", name)
-            cols[name] = heading
+        cols = parse_report_schema(root)
+        if cols and schema_cache:
+            schema_cache.put(report_path, cols, parse_column_types(root))
         return cols
     except Exception as e:
-        logging.error(f"Error fetching headers: {e}")
+        logger.error(f"Error fetching headers: {e}")
         return {}
 
-def fetch_rows(api_key, report_path, limit=1000, max_rows=None):
-    
-    url = "https://api-eu.hosted.exlibrisgroup.com/almaws/v1/analytics/reports"
-    headers = {"Authorization": f"apikey {api_key}", "Accept": "application/json"}
-    params = {"path": unquote(report_path), "limit": str(limit)}
-    token = None
-    total_yielded = 0
 
-    while True:
-        if token:
-            params['token'] = token
+def request_page(http, api_key, params, logger=None, retry=None):
+    """
+    Request one page of report results and parse it, retrying transient failures.
 
-        logging.debug(f"fetch_rows Requesting: {url}")
-        logging.debug(f"fetch_rows Params: {params}")
-        logging.debug(f"fetch_rows Headers: {headers}")
+    Returns:
+        xml.etree.ElementTree.Element: Root of the page's result XML, or None
+        if the page was empty
 
-        resp = requests.get(url, headers=headers, params=params)
-        if resp.status_code != 200:
-            logging.error(f"Failed to fetch rows: {resp.status_code}")
-            try:
-                logging.error(f"Response content: {resp.text}")
-            except Exception as e:
-                logging.error(f"Error reading response content: {e}")
-            break
+    Raises:
+        AlmaAPIError: if the request failed and could not be retried
+    """
+    logger = logger or logging.getLogger()
+    retry = retry or RetryPolicy(max_retries=0)
+    headers = {"Authorization": f"apikey {api_key}", "Accept": "application/json"}
 
-        xml = resp.json().get("anies", [None])[0]
-        if not xml:
+    logger.debug(f"fetch_rows Requesting: {API_URL}")
+    logger.debug(f"fetch_rows Params: {params}")
+    logger.debug(f"fetch_rows Headers: {headers}")
+
+    for attempt in range(retry.max_retries + 1):
+        retry.attempts += 1
+        started = time.monotonic()
+        try:
+            resp = http.get(API_URL, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if resp.status_code == 200:
+                xml = resp.json().get("anies", [None])[0]
+                if not xml:
+                    return None
+                return ET.fromstring(xml)
+            error = f"HTTP {resp.status_code}: {resp.text[:500]}"
+            if resp.status_code not in RetryPolicy.RETRYABLE_STATUS:
+                logger.error(f"Failed to fetch rows: {error}")
+                raise AlmaAPIError(f"Failed to fetch rows: {error}", resp.status_code)
+        retry.retry_seconds += time.monotonic() - started
+
+        if attempt == retry.max_retries:
             break
+        delay = retry.backoff(attempt + 1)
+        logger.warning(f"Page request failed ({error}); retry {attempt + 1}/{retry.max_retries} in {delay:.1f}s")
+        time.sleep(delay)
+        retry.retries += 1
+        retry.retry_seconds += delay
 
-        root = ET.fromstring(xml)
-        ns = {'ns0': 'urn:schemas-microsoft-com:xml-analysis:rowset'}
+    logger.error(f"Failed to fetch rows after {retry.max_retries + 1} attempts: {error}")
+    raise AlmaAPIError(f"Failed to fetch rows after {retry.max_retries + 1} attempts: {error}")
+
+
+def fetch_rows(api_key, report_path, columns, limit=1000, max_rows=None, logger=None, session=None,
+               pipelined=False, first_page=None, retry=None, checkpoint=None, report_filter=None):
+    """
+    Yield report rows page by page as tuples ordered like ``columns``.
+
+    If ``first_page`` is given (an already requested first results page) the
+    fetch continues from it instead of requesting page one again.
+
+    With a ``checkpoint`` each page is spilled to disk before its rows are
+    yielded. If the checkpoint was loaded from an earlier run, its spilled
+    rows are yielded first and the fetch continues from its token. The
+    caller clears the checkpoint once the rows are written.
+
+    In pipelined mode the ResumptionToken is read as soon as a page arrives
+    and the next page is requested on a background thread while the current
+    page's rows are parsed and written, so wall time is set by the slowest
+    stage rather than the sum of network, parsing and writing.
+    """
+    logger = logger or logging.getLogger()
+    http = session or requests
+    params = {"path": unquote(report_path), "limit": str(limit)}
+    if report_filter:
+        params['filter'] = report_filter
+    total_yielded = 0
+    parse_rows = make_row_parser(columns)
 
-        for row in root.findall('.//ns0:Row', ns):
-            row_data = {cell.tag.split('}')[-1]: cell.text for cell in row}
-            yield row_data
+    if checkpoint is not None and checkpoint.state['token']:
+        params['token'] = checkpoint.state['token']
+        for row in checkpoint.replay():
+            yield row
             total_yielded += 1
             if max_rows and total_yielded >= max_rows:
-                logging.info(f"[TEST MODE] Reached max rows limit: {max_rows}")
+                logger.info(f"[TEST MODE] Reached max rows limit: {max_rows}")
                 return
-        token_elem = root.find('.//ResumptionToken')
-        is_finished = root.find('.//IsFinished')
-        if is_finished is not None and is_finished.text == 'true':
-            break
-        token = token_elem.text if token_elem is not None else None
-
-def write_output(format, headers, rows, output_file):
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    if format == 'xlsx':
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.append(list(headers.values()))
-        for row in rows:
-            ws.append([row.get(k, '') for k in headers.keys()])
-        wb.save(output_file)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") if pipelined else None
+    if executor and first_page is None:
+        next_page = executor.submit(request_page, http, api_key, dict(params), logger, retry)
+    try:
+        while True:
+            if first_page is not None:
+                root, first_page = first_page, None
+            elif executor:
+                root = next_page.result()
+            else:
+                root = request_page(http, api_key, dict(params), logger, retry)
+            if root is None:
+                break
+
+            token_elem = root.find('.//ResumptionToken')
+            is_finished = root.find('.//IsFinished')
+            finished = is_finished is not None and is_finished.text == 'true'
+            # Alma only sends the token on the first page; later pages reuse it
+            if token_elem is not None and token_elem.text:
+                params['token'] = token_elem.text
+
+            page_rows = parse_rows(root)
+            # The page is on disk before the next one is requested, so a rerun never skips it
+            if checkpoint is not None:
+                page_rows = list(page_rows)
+                checkpoint.save_page(params.get('token'), page_rows)
+
+            if executor and not finished:
+                next_page = executor.submit(request_page, http, api_key, dict(params), logger, retry)
+
+            for row in page_rows:
+                yield row
+                total_yielded += 1
+                if max_rows and total_yielded >= max_rows:
+                    logger.info(f"[TEST MODE] Reached max rows limit: {max_rows}")
+                    return
+            if finished:
+                break
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def resume_checkpoint(http, api_key, params, checkpoint, logger=None, retry=None):
+    """
+    Request the page after a checkpoint's last saved page.
+
+    Returns:
+        Element: The page to continue from, or None if Alma rejected the
+        saved token (it has expired) and the report must be fetched again
+    """
+    logger = logger or logging.getLogger()
+    try:
+        page = request_page(http, api_key, dict(params, token=checkpoint.state['token']), logger, retry)
+    except AlmaAPIError as e:
+        # Running out of retries is not proof the token is bad; keep the checkpoint for the next run
+        if e.status_code is None:
+            raise
+        logger.warning(f"Checkpoint token was rejected, fetching the report from the start: {e}")
+        page = None
+    if page is None:
+        checkpoint.clear()
+        return None
+    logger.info(f"Resuming from checkpoint after {checkpoint.state['rows']} rows")
+    return page
+
+
+def fetch_report(api_key, report_path, limit=1000, max_rows=None, logger=None, session=None,
+                 pipelined=False, schema_cache=None, retry=None, checkpoint=None, report_filter=None):
+    """
+    Fetch a report's column map and rows with no separate schema request.
+
+    Alma embeds the XSD schema in the first results page, so the column map
+    is read from that page and the same page is then used as the first page
+    of rows. The schema cache, if given, is refreshed from the page and used
+    as a fallback when the page carries no schema.
+
+    If ``checkpoint`` holds a resumable earlier run, the fetch continues from
+    it and the column map comes from the checkpoint instead.
+
+    ``report_filter`` is an Analytics API filter (sawx XML) applied to the
+    report, e.g. from build_date_filter.
+
+    Returns:
+        tuple: (headers: dict, column_types: dict, rows: generator of tuples);
+        headers is empty if the first page could not be fetched
+    """
+    logger = logger or logging.getLogger()
+    http = session or requests
+    params = {"path": unquote(report_path), "limit": str(limit)}
+    if report_filter:
+        params['filter'] = report_filter
+
+    first_page = None
+    if checkpoint is not None and checkpoint.load(report_filter):
+        first_page = resume_checkpoint(http, api_key, params, checkpoint, logger, retry)
+
+    if first_page is not None:
+        headers = checkpoint.state['headers']
+        column_types = checkpoint.state.get('types', {})
     else:
-        delimiter = '\t' if format == 'tsv' else ','
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f, delimiter=delimiter)
-            writer.writerow(headers.values())
-            for row in rows:
-                writer.writerow([row.get(k, '') for k in headers.keys()])
-
-def run_single_report(task_name, config, args, api_key):
+        first_page = request_page(http, api_key, params, logger, retry)
+        if first_page is None:
+            return {}, {}, iter(())
+
+        headers = parse_report_schema(first_page)
+        column_types = parse_column_types(first_page)
+        if schema_cache:
+            if headers:
+                schema_cache.put(report_path, headers, column_types)
+            else:
+                headers = schema_cache.get(report_path) or {}
+                column_types = schema_cache.get_types(report_path)
+        if not headers:
+            return {}, {}, iter(())
+        if checkpoint is not None:
+            checkpoint.start(headers, report_filter, column_types)
+
+    rows = fetch_rows(api_key, report_path, list(headers), limit=limit, max_rows=max_rows,
+                      logger=logger, session=session, pipelined=pipelined, first_page=first_page,
+                      retry=retry, checkpoint=checkpoint, report_filter=report_filter)
+    return headers, column_types, rows
+
+
+def write_outputs(outputs, headers, rows, hash_store=None, merge_key=None, column_types=None):
+    """
+    Stream one row iterator into one or more outputs as the rows arrive.
+
+    Each file is written under a temporary name and renamed into place when
+    complete; see AtomicOutput. With ``merge_key`` the rows are merged into
+    the existing outputs by that key column instead; see MergingOutput.
+    A task's outputs are all or nothing: every temp file is finished before
+    any is moved into place, and if one output fails the task's other
+    outputs are discarded too, while other tasks sharing the fetch carry on.
+    An error reading the rows aborts every output and is raised.
+
+    Args:
+        outputs: List of dicts with the "task", "format" ("xlsx", "csv",
+            "tsv", "parquet", or "csv"/"tsv" with ".gz" or ".zst"), "file",
+            "compression_level" and "logger" of each output
+        headers: Dict mapping column names to column headings
+        rows: Iterable of column-ordered row tuples (typically the fetch_rows generator)
+        hash_store: Optional OutputHashStore; if the data is unchanged since the
+            last run the existing file is left as it is
+        merge_key: Heading (or column name) of the key column for an incremental merge
+        column_types: Column name -> xsd type from the report schema (used for XLSX and Parquet)
+
+    Returns:
+        list: Per output, the number of rows in the file or the exception it failed with
+    """
+    results = [None] * len(outputs)
+    writers = {}
+
+    def fail(i, error):
+        # Discard the rest of the task's outputs along with the one that failed
+        results[i] = error
+        for j, output in enumerate(outputs):
+            if output['task'] == outputs[i]['task'] and results[j] is None:
+                results[j] = RuntimeError(f"Discarded because {outputs[i]['file']} failed: {error}")
+        for j in [j for j in writers if results[j] is not None]:
+            writers.pop(j).abort()
+
+    for i, output in enumerate(outputs):
+        if results[i] is not None:
+            continue
+        try:
+            if merge_key:
+                writers[i] = MergingOutput(output['format'], headers, output['file'], merge_key, hash_store,
+                                           column_types, output['compression_level'], logger=output['logger'])
+            else:
+                writers[i] = AtomicOutput(output['format'], headers, output['file'], hash_store,
+                                          column_types, output['compression_level'], output['logger'])
+        except Exception as e:
+            fail(i, e)
+
+    try:
+        for row in rows:
+            if not writers:
+                break
+            for i, writer in list(writers.items()):
+                if i not in writers:
+                    continue  # discarded along with another output of its task
+                try:
+                    writer.writerow(row)
+                except Exception as e:
+                    fail(i, e)
+        for i, writer in list(writers.items()):
+            if i not in writers:
+                continue
+            try:
+                writer.finish()
+            except Exception as e:
+                fail(i, e)
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    for i, writer in writers.items():
+        try:
+            writer.commit()
+        except Exception as e:
+            results[i] = e
+            continue
+        logger = outputs[i]['logger']
+        if merge_key:
+            logger.info(f"Merged into {outputs[i]['file']}: {writer.updated} rows replaced, {writer.added} added")
+        if writer.unchanged:
+            logger.info(f"Output unchanged since the last run, left {outputs[i]['file']} untouched")
+        results[i] = writer.row_count
+    return results
+
+
+def prepare_task(task_name, config, args, api_key):
+    """
+    Set up logging for a task and work out where its outputs go.
+
+    Returns:
+        list: Per OUTPUT_FORMAT, a dict with the "task", "logger", "format",
+        "file" and "compression_level" of the output
+    """
+    is_test = args.test_mode
+    report_path = config['ALMA_REPORT_PATH']
+    output_file = config['OUTPUT_FILE_NAME']
+    targets = output_targets(config.get('OUTPUT_FORMAT', 'xlsx'), output_file)
+    output_format = ', '.join(output_format for output_format, _ in targets)
+    output_path = config.get('TEST_OUTPUT_PATH') if is_test and 'TEST_OUTPUT_PATH' in config else config['OUTPUT_PATH']
+    log_dir = config.get('TEST_LOG_DIR') if is_test and 'TEST_LOG_DIR' in config else config.get('LOG_DIR', '')
+
+    logger, log_file = setup_logging(log_dir, task_name,
+                                     config.get('LOG_COMPRESS_AFTER_DAYS'), config.get('LOG_DELETE_AFTER_DAYS'))
+    logger.info(f"Started task: {task_name}")
+
+    print(f"Running task: {task_name}")
+    print(f"Using API key: {api_key}, "
+          f"Report Path: {report_path}, "
+          f"Output Path: {output_path}, "
+          f"Output File: {output_file}, "
+          f"Output Format: {output_format}")
+
+    logger.info(f"Task: {task_name}")
+    logger.info(f"Report path: {report_path}")
+    for _, file_name in targets:
+        logger.info(f"Output file: {os.path.join(output_path, file_name)}")
+    logger.info(f"Test mode: {args.test_mode}")
+    return [{'task': task_name, 'logger': logger, 'format': output_format,
+             'file': os.path.join(output_path, file_name), 'compression_level': config.get('COMPRESSION_LEVEL')}
+            for output_format, file_name in targets]
+
+
+def run_single_report(task_name, config, args, api_key, session=None):
     """
     Run a single report task and return success status.
 
@@ -160,71 +541,193 @@ def run_single_report(task_name, config, args, api_key):
         config: Configuration dict for this task
         args: Parsed command line arguments
         api_key: Alma API key
+        session: Shared HTTP session (a new pooled session is created if omitted)
 
     Returns:
         tuple: (success: bool, message: str)
     """
+    return run_shared_report([(task_name, config)], args, api_key, session)[0]
+
+
+def run_shared_report(tasks, args, api_key, session=None):
+    """
+    Run one or more tasks that export the same report from a single fetch.
+    The rows are fetched once with the first task's settings and streamed
+    into every output of every task (one per OUTPUT_FORMAT) at the same
+    time. A failure while fetching fails every task; a failure writing one
+    task's output fails only that task.
+
+    Args:
+        tasks: List of (task_name, config) sharing one ALMA_REPORT_PATH (see
+            group_shared_tasks); only a task run on its own may be incremental
+        args: Parsed command line arguments
+        api_key: Alma API key
+        session: Shared HTTP session (a new pooled session is created if omitted)
+
+    Returns:
+        list: (success: bool, message: str) per task, in the order given
+    """
+    session = session or create_session()
+    task_name, config = tasks[0]
+    task_outputs = []
     try:
-        max_rows = config.get('TEST_ROW_LIMIT', None) if args.test_mode else None
-        report_path = config['ALMA_REPORT_PATH']
-        output_file = config['OUTPUT_FILE_NAME']
-        output_format = config.get('OUTPUT_FORMAT', 'xlsx').lower()
+        for name, task_config in tasks:
+            task_outputs.append(prepare_task(name, task_config, args, api_key))
+        logger = task_outputs[0][0]['logger']
+        if len(tasks) > 1:
+            names = ', '.join(name for name, _ in tasks)
+            for outputs in task_outputs:
+                outputs[0]['logger'].info(f"Report fetched once for tasks: {names}")
+        outputs = [output for outputs in task_outputs for output in outputs]
+        out_files = [output['file'] for output in task_outputs[0]]
+
         is_test = args.test_mode
-        output_path = config.get('TEST_OUTPUT_PATH') if is_test and 'TEST_OUTPUT_PATH' in config else config['OUTPUT_PATH']
-        log_dir = config.get('TEST_LOG_DIR') if is_test and 'TEST_LOG_DIR' in config else config.get('LOG_DIR', '')
+        max_rows = config.get('TEST_ROW_LIMIT', None) if is_test else None
+        report_path = config['ALMA_REPORT_PATH']
+
+        schema_cache_dir = args.schema_cache
+        schema_cache = SchemaCache(schema_cache_dir, args.schema_cache_ttl) if schema_cache_dir else None
+
+        retry = RetryPolicy(args.retries, args.retry_backoff)
+        checkpoint = Checkpoint(args.checkpoint_dir, task_name, report_path) if args.checkpoint_dir else None
+
+        # Incremental tasks fetch only rows dated since the last successful run (test runs always fetch in full)
+        incremental = is_incremental(config) and not is_test and len(tasks) == 1
+        run_date = datetime.date.today()
+        watermarks = WatermarkStore(args.watermarks) if incremental else None
+        report_filter = plan_incremental(config, out_files, watermarks, args.full_refresh, logger) if incremental else None
+
+        def fetch(report_filter):
+            # The column map comes from the first data page, so there is no separate schema request
+            return fetch_report(api_key, report_path, limit=1000, max_rows=max_rows,
+                                logger=logger, session=session,
+                                pipelined=args.pipelined,
+                                schema_cache=schema_cache, retry=retry,
+                                checkpoint=checkpoint, report_filter=report_filter)
+
+        headers, column_types, rows = fetch(report_filter)
+        if report_filter and headers and any(read_output_headings(output['format'], output['file']) != list(headers.values())
+                                             for output in outputs):
+            logger.warning("Existing output's columns differ from the report; fetching the full report")
+            rows.close()
+            report_filter = None
+            headers, column_types, rows = fetch(None)
+        if not headers:
+            raise ValueError("No headers found for report")
+
+        # Rows are written as each page is parsed, so memory stays flat regardless of report size
+        hash_store = OutputHashStore(args.output_hashes) if args.output_hashes else None
+        merge_key = config['INCREMENTAL_KEY_COLUMN'] if report_filter else None
+        results = write_outputs(outputs, headers, rows, hash_store, merge_key, column_types)
+        # Kept if any output failed, so a rerun resumes instead of fetching again
+        if checkpoint is not None and not any(isinstance(result, Exception) for result in results):
+            checkpoint.clear()
+        if incremental:
+            for output, result in zip(outputs, results):
+                if not isinstance(result, Exception):
+                    watermarks.put(output['file'], run_date)
+        log_pool_stats(session, logger)
+        logger.info(f"Retries: {retry.summary()}")
+        if getattr(session, 'governor', None):
+            logger.info(f"Rate governor: {session.governor.stats()}")
+
+        # A task succeeds when every one of its outputs was written
+        outcomes = []
+        results = iter(results)
+        for (name, _), outputs in zip(tasks, task_outputs):
+            task_results = [next(results) for _ in outputs]
+            task_logger = outputs[0]['logger']
+            errors = [result for result in task_results if isinstance(result, Exception)]
+            if errors:
+                error_msg = f"Error running task {name}: {str(errors[0])}"
+                task_logger.error(error_msg)
+                outcomes.append((False, error_msg))
+            else:
+                files = ', '.join(output['file'] for output in outputs)
+                success_msg = f"Finished task {name}. Output: {files}, Rows: {task_results[0]}"
+                task_logger.info(success_msg)
+                outcomes.append((True, success_msg))
+        return outcomes
 
-        log_file = setup_logging(log_dir, task_name)
-        logging.info(f"Started task: {task_name}")
+    except Exception as e:
+        outcomes = []
+        for i, (name, _) in enumerate(tasks):
+            error_msg = f"Error running task {name}: {str(e)}"
+            (task_outputs[i][0]['logger'] if i < len(task_outputs) else logging.getLogger()).error(error_msg)
+            outcomes.append((False, error_msg))
+        return outcomes
 
-        print(f"Running task: {task_name}")
-        print(f"Using API key: {api_key}, "
-              f"Report Path: {report_path}, "
-              f"Output Path: {output_path}, "
-              f"Output File: {output_file}, "
-              f"Output Format: {output_format}")
 
-        logging.info(f"Task: {task_name}")
-        logging.info(f"Report path: {report_path}")
-        logging.info(f"Output file: {os.path.join(output_path, output_file)}")
-        logging.info(f"Test mode: {args.test_mode}")
+def group_shared_tasks(tasks, test_mode=False):
+    """
+    Group batch tasks that can be served by a single fetch: tasks with the
+    same ALMA_REPORT_PATH (and, in test mode, the same TEST_ROW_LIMIT).
+    Incremental tasks always run on their own, since each one fetches only
+    what changed since its own output was written.
 
-        headers = get_report_headers(api_key, report_path)
-        if not headers:
-            error_msg = f"No headers found for task {task_name}"
-            logging.error(error_msg)
-            return False, error_msg
+    Args:
+        tasks: List of (task_name, config)
+        test_mode: Whether the batch runs in test mode
 
-        max_rows = config.get('TEST_ROW_LIMIT') if args.test_mode else None
+    Returns:
+        list: Lists of (task_name, config), ordered by each group's first task
+    """
+    groups = {}
+    for task_name, config in tasks:
+        if is_incremental(config) and not test_mode:
+            key = ('task', task_name)
+        else:
+            key = (unquote(config['ALMA_REPORT_PATH']), config.get('TEST_ROW_LIMIT') if test_mode else None)
+        groups.setdefault(key, []).append((task_name, config))
+    return list(groups.values())
 
-        rows = list(fetch_rows(api_key, report_path, limit=1000, max_rows=max_rows))
-        out_file = os.path.join(output_path, output_file)
-        write_output(output_format, headers, rows, out_file)
-        success_msg = f"Finished task {task_name}. Output: {out_file}, Rows: {len(rows)}"
-        logging.info(success_msg)
-        return True, success_msg
 
-    except Exception as e:
-        error_msg = f"Error running task {task_name}: {str(e)}"
-        logging.error(error_msg)
-        return False, error_msg
+def setup_batch_logging(all_configs, args):
+    """
+    Set up the log of a batch run as a whole (download_analytics_log_<timestamp>.log),
+    which records the tasks found and the batch's outcome; each task logs
+    to its own file. It is written to the log directory of the first task in
+    the batch, whose retention settings it also follows.
+
+    Args:
+        all_configs: Dict of all task configurations
+        args: Parsed command line arguments
+
+    Returns:
+        logging.Logger: The batch logger
+    """
+    batch_config = next((config for config in all_configs.values()
+                         if config.get('FREQUENCY', '').lower() == args.report_type.lower()
+                         and config.get('ACTIVE', True)), {})
+    log_dir = batch_config.get('TEST_LOG_DIR') if args.test_mode and 'TEST_LOG_DIR' in batch_config else batch_config.get('LOG_DIR', '')
+    # With no task to run there is nowhere to write, so the batch logs to the console only
+    logger, _ = setup_logging(log_dir if batch_config else None, "", batch_config.get('LOG_COMPRESS_AFTER_DAYS'),
+                              batch_config.get('LOG_DELETE_AFTER_DAYS'))
+    return logger
 
 
-def run_batch_reports(all_configs, report_type, args):
+def run_batch_reports(all_configs, report_type, args, logger=None):
     """
     Run all reports matching the specified frequency type.
 
+    Tasks that export the same report are fetched once and the rows are
+    written to each of their outputs (see group_shared_tasks). With
+    ``args.workers`` greater than 1 the reports run concurrently in a
+    bounded thread pool. Results are always reported in config order.
+
     Args:
         all_configs: Dict of all task configurations
         report_type: Frequency type to filter by ("daily" or "weekly")
         args: Parsed command line arguments
+        logger: Logger for the batch as a whole (see setup_batch_logging)
 
     Returns:
         tuple: (success_count: int, failure_count: int, results: list)
     """
+    logger = logger or logging.getLogger("alma_reports")
     api_key = os.getenv('ALMA_PROD_API_KEY')
     if not api_key:
-        logging.error("ALMA_PROD_API_KEY environment variable not set")
-        print("Error: ALMA_PROD_API_KEY environment variable not set")
+        logger.error("ALMA_PROD_API_KEY environment variable not set")
         return 0, 0, []
 
     # Filter configs by frequency and active status
@@ -236,24 +739,51 @@ def run_batch_reports(all_configs, report_type, args):
             matching_tasks.append((task_name, config))
 
     if not matching_tasks:
-        logging.warning(f"No reports found with frequency '{report_type}'")
-        print(f"No reports found with frequency '{report_type}'")
+        logger.warning(f"No reports found with frequency '{report_type}'")
         return 0, 0, []
 
-    logging.info(f"Found {len(matching_tasks)} reports with frequency '{report_type}'")
-    print(f"Found {len(matching_tasks)} reports with frequency '{report_type}'")
+    logger.info(f"Found {len(matching_tasks)} reports with frequency '{report_type}'")
+
+    workers = args.workers
+    # One keep-alive pool shared by every page and every task of the batch
+    pool_size = max(args.pool_size, workers)
+    governor = RateGovernor(args.max_rps, daily_reserve=args.daily_quota_reserve)
+    session = create_session(pool_maxsize=pool_size, governor=governor)
+
+    # Tasks exporting the same report share one fetch
+    groups = group_shared_tasks(matching_tasks, args.test_mode)
+    if len(groups) < len(matching_tasks):
+        logger.info(f"Fetching {len(groups)} distinct reports for {len(matching_tasks)} tasks")
+
+    if workers == 1:
+        group_outcomes = []
+        for group in groups:
+            print(f"\n{'='*60}")
+            print(f"Running report: {', '.join(task_name for task_name, _ in group)}")
+            print(f"{'='*60}")
+            group_outcomes.append(run_shared_report(group, args, api_key, session))
+    else:
+        workers = min(workers, len(groups))
+        logger.info(f"Running {len(groups)} reports with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report") as executor:
+            futures = []
+            for group in groups:
+                print(f"Queued report: {', '.join(task_name for task_name, _ in group)}")
+                futures.append(executor.submit(run_shared_report, group, args, api_key, session))
+            group_outcomes = [future.result() for future in futures]
+
+    outcome_by_task = {}
+    for group, group_results in zip(groups, group_outcomes):
+        for (task_name, _), outcome in zip(group, group_results):
+            outcome_by_task[task_name] = outcome
+    outcomes = [outcome_by_task[task_name] for task_name, _ in matching_tasks]
 
     success_count = 0
     failure_count = 0
     results = []
 
-    for task_name, config in matching_tasks:
-        print(f"\n{'='*60}")
-        print(f"Running report: {task_name}")
-        print(f"{'='*60}")
-
-        success, message = run_single_report(task_name, config, args, api_key)
-
+    for (task_name, _), (success, message) in zip(matching_tasks, outcomes):
+        task_logger = logging.getLogger(f"alma_reports.{task_name}")
         if success:
             success_count += 1
             results.append({'task': task_name, 'status': 'success', 'message': message})
@@ -261,7 +791,13 @@ def run_batch_reports(all_configs, report_type, args):
             failure_count += 1
             results.append({'task': task_name, 'status': 'failed', 'message': message})
             print(f"Error: {message}")
-            logging.error(f"Task {task_name} failed: {message}")
+            task_logger.error(f"Task {task_name} failed: {message}")
+        close_logging(task_logger)
+
+    stats = pool_stats(session)
+    session.close()
+    logger.info(f"HTTP pool: {stats['requests']} requests over {stats['connections']} connections")
+    logger.info(f"Rate governor: {governor.stats()}")
 
     return success_count, failure_count, results
 
@@ -278,11 +814,52 @@ def main():
                         help='Path to the configuration JSON file')
     parser.add_argument('--test-mode', action='store_true',
                         help='Run in test mode with limited rows')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of reports to run concurrently in batch mode (default: 1)')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='Request the next page while the current one is parsed and written')
+    parser.add_argument('--schema-cache', metavar='DIR',
+                        help='Directory for an on-disk cache of report column maps')
+    parser.add_argument('--schema-cache-ttl', type=int, default=86400,
+                        help='Seconds a cached column map stays valid (default: 86400)')
+    parser.add_argument('--max-rps', type=float, default=20.0,
+                        help='Maximum Alma API requests per second across all workers (default: 20)')
+    parser.add_argument('--daily-quota-reserve', type=int, default=0,
+                        help='Stop sending requests once the daily API quota left falls to this (default: 0)')
+    parser.add_argument('--retries', type=int, default=4,
+                        help='Retries per page on connection errors, 429 and 5xx responses (default: 4)')
+    parser.add_argument('--retry-backoff', type=float, default=2.0,
+                        help='Base seconds for exponential retry backoff with jitter (default: 2)')
+    parser.add_argument('--output-hashes', metavar='FILE',
+                        help='JSON file of output content hashes; outputs whose data has not changed '
+                             'since the last run are left untouched (default: output_hashes.json next to --config)')
+    parser.add_argument('--no-output-hashes', dest='output_hashes', action='store_const', const='',
+                        help='Always replace outputs, even when their data has not changed')
+    parser.add_argument('--watermarks', metavar='FILE',
+                        help='JSON file of incremental task watermarks (default: watermarks.json next to --config)')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='Fetch incremental tasks in full instead of only rows since the last run')
+    parser.add_argument('--checkpoint-dir', metavar='DIR',
+                        help='Checkpoint each page to this directory so a failed task resumes where it stopped')
+    parser.add_argument('--pool-size', type=int, default=10,
+                        help='Keep-alive HTTP connections per host shared by all requests (default: 10)')
     args = parser.parse_args()
 
     # Validate arguments: either --task or --report-type must be provided
     if not args.task and not args.report_type:
         parser.error("Either --task or --report-type must be provided")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.pool_size < 1:
+        parser.error("--pool-size must be at least 1")
+    if args.max_rps <= 0:
+        parser.error("--max-rps must be greater than 0")
+    if args.retries < 0:
+        parser.error("--retries cannot be negative")
+    if args.output_hashes is None:
+        args.output_hashes = os.path.join(os.path.dirname(os.path.abspath(args.config)), 'output_hashes.json')
+    if args.watermarks is None:
+        args.watermarks = os.path.join(os.path.dirname(os.path.abspath(args.config)), 'watermarks.json')
 
     with open(args.config, 'r') as f:
         all_configs = json.load(f)
@@ -293,7 +870,8 @@ def main():
         print(f"BATCH MODE: Running all '{args.report_type}' reports")
         print(f"{'='*60}")
 
-        success_count, failure_count, results = run_batch_reports(all_configs, args.report_type, args)
+        batch_logger = setup_batch_logging(all_configs, args)
+        success_count, failure_count, results = run_batch_reports(all_configs, args.report_type, args, batch_logger)
 
         # Print summary
         print(f"\n{'='*60}")
@@ -310,7 +888,8 @@ def main():
                 status_icon = "[OK]" if result['status'] == 'success' else "[FAILED]"
                 print(f"  {status_icon} {result['task']}")
 
-        logging.info(f"Batch execution completed. Success: {success_count}, Failed: {failure_count}")
+        batch_logger.info(f"Batch execution completed. Success: {success_count}, Failed: {failure_count}")
+        close_logging(batch_logger)
 
         # Exit with error code if any reports failed
         if failure_count > 0:
@@ -320,7 +899,6 @@ def main():
     # Single task mode: run a specific task (backward compatibility)
     if args.task not in all_configs:
         print(f"Error: Task '{args.task}' not found in configuration")
-        logging.error(f"Task '{args.task}' not found in configuration")
         sys.exit(1)
 
     config = all_configs[args.task]
@@ -329,7 +907,9 @@ def main():
         print("Error: ALMA_PROD_API_KEY environment variable not set")
         sys.exit(1)
 
-    success, message = run_single_report(args.task, config, args, api_key)
+    governor = RateGovernor(args.max_rps, daily_reserve=args.daily_quota_reserve)
+    session = create_session(pool_maxsize=args.pool_size, governor=governor)
+    success, message = run_single_report(args.task, config, args, api_key, session)
     if not success:
         print(f"Error: {message}")
         sys.exit(1)
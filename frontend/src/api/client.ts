@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { Task, TaskCreate, TaskUpdate, Job, LogFile, LogContent } from '../types';
+import type { Task, TaskCreate, TaskUpdate, Job, LogFile, LogContent, LogSearchResult } from '../types';
 
 const api = axios.create({
   baseURL: '/api/v1',
@@ -20,18 +20,36 @@ export const tasksApi = {
 export const reportsApi = {
   run: (taskName: string, testMode: boolean) =>
     api.post<Job>('/reports/run', { task_name: taskName, test_mode: testMode }).then((r) => r.data),
-  listJobs: (limit = 50) => api.get<Job[]>(`/reports/jobs?limit=${limit}`).then((r) => r.data),
+  listJobs: (limit = 50, before?: string) =>
+    api.get<Job[]>('/reports/jobs', { params: { limit, before } }).then((r) => r.data),
   getJob: (jobId: string) => api.get<Job>(`/reports/jobs/${jobId}`).then((r) => r.data),
   cancelJob: (jobId: string) => api.post(`/reports/jobs/${jobId}/cancel`),
+  jobEventsUrl: (jobId?: string) =>
+    `${api.defaults.baseURL}/reports/jobs/events${jobId ? `?job_id=${encodeURIComponent(jobId)}` : ''}`,
 };
 
 export const logsApi = {
   listFiles: (taskName: string, testMode = false) =>
     api.get<LogFile[]>(`/logs/${taskName}?test_mode=${testMode}`).then((r) => r.data),
-  readFile: (taskName: string, filename: string, testMode = false, tail = 500) =>
+  readFile: (taskName: string, filename: string, testMode = false, tail = 500, before?: number) =>
     api
-      .get<LogContent>(`/logs/${taskName}/${filename}?test_mode=${testMode}&tail=${tail}`)
+      .get<LogContent>(`/logs/${taskName}/${filename}`, { params: { test_mode: testMode, tail, before } })
       .then((r) => r.data),
+  search: (query: string, options: { testMode?: boolean; since?: string; until?: string; regex?: boolean } = {}) =>
+    api
+      .get<LogSearchResult>('/logs/search', {
+        params: {
+          q: query,
+          test_mode: options.testMode ?? false,
+          since: options.since || undefined,
+          until: options.until || undefined,
+          regex: options.regex ?? false,
+        },
+      })
+      .then((r) => r.data),
+  followUrl: (taskName: string, filename: string, testMode: boolean, offset: number) =>
+    `${api.defaults.baseURL}/logs/${encodeURIComponent(taskName)}/${encodeURIComponent(filename)}/follow` +
+    `?test_mode=${testMode}&offset=${offset}`,
 };
 
 export default api;
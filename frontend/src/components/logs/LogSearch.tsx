@@ -0,0 +1,91 @@
+import { useState, type FormEvent } from 'react';
+import { Search } from 'lucide-react';
+import { Input } from '../ui/Input';
+import { Button } from '../ui/Button';
+import { logsApi } from '../../api/client';
+import type { LogSearchHit, LogSearchResult } from '../../types';
+
+interface LogSearchProps {
+  testMode: boolean;
+  onOpen: (hit: LogSearchHit) => void;
+}
+
+export function LogSearch({ testMode, onOpen }: LogSearchProps) {
+  const [query, setQuery] = useState('');
+  const [since, setSince] = useState('');
+  const [until, setUntil] = useState('');
+  const [regex, setRegex] = useState(false);
+  const [result, setResult] = useState<LogSearchResult | null>(null);
+  const [searching, setSearching] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  const handleSearch = async (e: FormEvent) => {
+    e.preventDefault();
+    if (!query) return;
+    try {
+      setSearching(true);
+      setError(null);
+      setResult(await logsApi.search(query, { testMode, since, until, regex }));
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Search failed');
+      setResult(null);
+    } finally {
+      setSearching(false);
+    }
+  };
+
+  return (
+    <div className="space-y-4">
+      <form onSubmit={handleSearch} className="flex flex-wrap items-end gap-4">
+        <div className="min-w-64 flex-1">
+          <Input
+            label="Search all task logs"
+            value={query}
+            onChange={(e) => setQuery(e.target.value)}
+            placeholder="e.g. Failed to fetch rows"
+          />
+        </div>
+        <Input label="From" type="date" value={since} onChange={(e) => setSince(e.target.value)} />
+        <Input label="To" type="date" value={until} onChange={(e) => setUntil(e.target.value)} />
+        <label className="flex items-center gap-2 pb-2">
+          <input
+            type="checkbox"
+            checked={regex}
+            onChange={(e) => setRegex(e.target.checked)}
+            className="h-4 w-4 rounded border-gray-300"
+          />
+          <span className="text-sm">Regex</span>
+        </label>
+        <Button type="submit" disabled={!query || searching}>
+          <Search className="mr-2 h-4 w-4" />
+          {searching ? 'Searching...' : 'Search'}
+        </Button>
+      </form>
+
+      {error && <p className="text-sm text-[hsl(var(--destructive))]">{error}</p>}
+
+      {result && (
+        <div className="space-y-2">
+          <p className="text-xs text-[hsl(var(--muted-foreground))]">
+            {result.hits.length} matching lines in {result.files_searched} logs
+            {result.truncated && ' (stopped at the limit; narrow the search to see more)'}
+          </p>
+          <div className="max-h-[300px] space-y-1 overflow-auto">
+            {result.hits.map((hit) => (
+              <button
+                key={`${hit.task}-${hit.name}-${hit.line_number}`}
+                onClick={() => onOpen(hit)}
+                className="w-full rounded-md px-3 py-1.5 text-left hover:bg-[hsl(var(--muted))]"
+              >
+                <p className="text-xs text-[hsl(var(--muted-foreground))]">
+                  {hit.task} · {hit.name}:{hit.line_number}
+                </p>
+                <p className="truncate font-mono text-xs">{hit.line}</p>
+              </button>
+            ))}
+          </div>
+        </div>
+      )}
+    </div>
+  );
+}
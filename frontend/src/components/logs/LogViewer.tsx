@@ -1,23 +1,57 @@
 import { useEffect, useRef } from 'react';
+import { Button } from '../ui/Button';
 
 interface LogViewerProps {
   content: string;
   filename: string;
+  hasEarlier?: boolean;
+  onLoadEarlier?: () => void;
+  following?: boolean;
+  onToggleFollow?: () => void;
 }
 
-export function LogViewer({ content, filename }: LogViewerProps) {
+export function LogViewer({
+  content,
+  filename,
+  hasEarlier = false,
+  onLoadEarlier,
+  following = false,
+  onToggleFollow,
+}: LogViewerProps) {
   const preRef = useRef<HTMLPreElement>(null);
+  const lastLineRef = useRef<string>('');
+  const heightRef = useRef(0);
 
   useEffect(() => {
-    if (preRef.current) {
-      preRef.current.scrollTop = preRef.current.scrollHeight;
+    const pre = preRef.current;
+    if (!pre) return;
+    // Earlier lines are prepended without moving the view; new ones scroll to the bottom
+    const lastLine = content.slice(content.lastIndexOf('\n', content.length - 2));
+    if (lastLine !== lastLineRef.current) {
+      pre.scrollTop = pre.scrollHeight;
+    } else {
+      pre.scrollTop += pre.scrollHeight - heightRef.current;
     }
+    lastLineRef.current = lastLine;
+    heightRef.current = pre.scrollHeight;
   }, [content]);
 
   return (
     <div className="flex flex-col rounded-lg border border-[hsl(var(--border))]">
-      <div className="border-b border-[hsl(var(--border))] bg-[hsl(var(--muted))] px-4 py-2">
-        <p className="font-mono text-sm">{filename}</p>
+      <div className="flex items-center justify-between gap-2 border-b border-[hsl(var(--border))] bg-[hsl(var(--muted))] px-4 py-2">
+        <p className="truncate font-mono text-sm">{filename}</p>
+        <div className="flex gap-2">
+          {onLoadEarlier && (
+            <Button variant="outline" size="sm" onClick={onLoadEarlier} disabled={!hasEarlier}>
+              Load earlier
+            </Button>
+          )}
+          {onToggleFollow && (
+            <Button variant={following ? 'primary' : 'outline'} size="sm" onClick={onToggleFollow}>
+              {following ? 'Following' : 'Follow'}
+            </Button>
+          )}
+        </div>
       </div>
       <pre
         ref={preRef}
@@ -1,2 +1,3 @@
 export { LogViewer } from './LogViewer';
 export { LogFileList } from './LogFileList';
+export { LogSearch } from './LogSearch';
@@ -2,7 +2,7 @@ import { useState } from 'react';
 import { Modal } from '../ui/Modal';
 import { Button } from '../ui/Button';
 import { JobStatusCard } from './JobStatus';
-import { useJobPolling } from '../../hooks';
+import { useJobStream } from '../../hooks';
 import type { Task, Job } from '../../types';
 
 interface RunReportModalProps {
@@ -18,7 +18,7 @@ export function RunReportModal({ isOpen, onClose, task, testMode, onRun }: RunRe
   const [starting, setStarting] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
-  const { job } = useJobPolling(jobId);
+  const { job } = useJobStream(jobId);
 
   const handleRun = async () => {
     if (!task) return;
@@ -17,7 +17,7 @@ interface TaskCardProps {
 export function TaskCard({ task, onEdit, onDelete, onRun, onViewLogs, onToggleActive }: TaskCardProps) {
   const [menuOpen, setMenuOpen] = useState(false);
   const menuRef = useRef<HTMLDivElement>(null);
-  const formatBadge = task.output_format.toUpperCase();
+  const formatBadge = ([] as string[]).concat(task.output_format).join(' + ').toUpperCase();
 
   // Close menu when clicking outside
   useEffect(() => {
@@ -16,6 +16,11 @@ const formatOptions = [
   { value: 'xlsx', label: 'Excel (xlsx)' },
   { value: 'csv', label: 'CSV' },
   { value: 'tsv', label: 'TSV' },
+  { value: 'csv.gz', label: 'CSV (gzip)' },
+  { value: 'tsv.gz', label: 'TSV (gzip)' },
+  { value: 'csv.zst', label: 'CSV (zstd)' },
+  { value: 'tsv.zst', label: 'TSV (zstd)' },
+  { value: 'parquet', label: 'Parquet' },
 ];
 
 const frequencyOptions = [
@@ -35,6 +40,10 @@ const defaultValues: TaskCreate = {
   test_row_limit: 25,
   frequency: 'daily',
   active: true,
+  incremental_date_column: '',
+  incremental_key_column: '',
+  incremental_lookback_days: 1,
+  priority: 0,
 };
 
 export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
@@ -43,6 +52,9 @@ export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
   const [errors, setErrors] = useState<Record<string, string>>({});
 
   const isEditing = !!task;
+  // The first format is the main output; any others are written from the same fetch
+  const formats = ([] as string[]).concat(formData.output_format);
+  const setFormats = (next: string[]) => handleChange('output_format', next.length === 1 ? next[0] : next);
 
   useEffect(() => {
     if (task) {
@@ -58,6 +70,13 @@ export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
         test_row_limit: task.test_row_limit,
         frequency: task.frequency || 'daily',
         active: task.active !== false, // Default to true if undefined
+        incremental_date_column: task.incremental_date_column || '',
+        incremental_key_column: task.incremental_key_column || '',
+        incremental_lookback_days: task.incremental_lookback_days ?? 1,
+        compression_level: task.compression_level,
+        priority: task.priority ?? 0,
+        log_compress_after_days: task.log_compress_after_days,
+        log_delete_after_days: task.log_delete_after_days,
       });
     } else {
       setFormData(defaultValues);
@@ -65,7 +84,7 @@ export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
     setErrors({});
   }, [task, isOpen]);
 
-  const handleChange = (field: keyof TaskCreate, value: string | number | boolean) => {
+  const handleChange = (field: keyof TaskCreate, value: string | string[] | number | boolean | undefined) => {
     setFormData((prev) => ({ ...prev, [field]: value }));
     if (errors[field]) {
       setErrors((prev) => ({ ...prev, [field]: '' }));
@@ -176,8 +195,8 @@ export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
         <div className="grid grid-cols-3 gap-4">
           <Select
             label="Output Format"
-            value={formData.output_format}
-            onChange={(e) => handleChange('output_format', e.target.value)}
+            value={formats[0]}
+            onChange={(e) => setFormats([e.target.value, ...formats.slice(1).filter((f) => f !== e.target.value)])}
             options={formatOptions}
           />
           <Select
@@ -195,6 +214,72 @@ export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
           />
         </div>
 
+        <div className="space-y-2">
+          <span className="text-sm font-medium">Also Write As</span>
+          <div className="flex flex-wrap gap-4">
+            {formatOptions
+              .filter((opt) => opt.value !== formats[0])
+              .map((opt) => (
+                <label key={opt.value} className="flex items-center gap-2 text-sm">
+                  <input
+                    type="checkbox"
+                    checked={formats.includes(opt.value)}
+                    onChange={(e) =>
+                      setFormats(e.target.checked ? [...formats, opt.value] : formats.filter((f) => f !== opt.value))
+                    }
+                    className="h-4 w-4 rounded border-[hsl(var(--border))] text-[hsl(var(--primary))] focus:ring-[hsl(var(--primary))]"
+                  />
+                  {opt.label}
+                </label>
+              ))}
+          </div>
+        </div>
+
+        {formats.some((f) => /\.(gz|zst)$/.test(f)) && (
+          <div className="grid grid-cols-3 gap-4">
+            <Input
+              label="Compression Level"
+              type="number"
+              value={formData.compression_level ?? ''}
+              onChange={(e) =>
+                handleChange('compression_level', e.target.value === '' ? undefined : parseInt(e.target.value))
+              }
+              placeholder={formats.some((f) => f.endsWith('.zst')) ? 'Default 3 (1-22)' : 'Default 6 (0-9)'}
+              min={0}
+            />
+          </div>
+        )}
+
+        <div className="grid grid-cols-3 gap-4">
+          <Input
+            label="Queue Priority"
+            type="number"
+            value={formData.priority ?? 0}
+            onChange={(e) => handleChange('priority', parseInt(e.target.value) || 0)}
+            placeholder="0"
+          />
+          <Input
+            label="Compress Logs After (days)"
+            type="number"
+            value={formData.log_compress_after_days ?? ''}
+            onChange={(e) =>
+              handleChange('log_compress_after_days', e.target.value === '' ? undefined : parseInt(e.target.value))
+            }
+            placeholder="Never"
+            min={1}
+          />
+          <Input
+            label="Delete Logs After (days)"
+            type="number"
+            value={formData.log_delete_after_days ?? ''}
+            onChange={(e) =>
+              handleChange('log_delete_after_days', e.target.value === '' ? undefined : parseInt(e.target.value))
+            }
+            placeholder="Never"
+            min={1}
+          />
+        </div>
+
         <div className="border-t border-[hsl(var(--border))] pt-4">
           <h4 className="mb-3 text-sm font-medium">Test Mode Settings</h4>
           <div className="grid grid-cols-2 gap-4">
@@ -221,6 +306,33 @@ export function TaskForm({ isOpen, onClose, onSubmit, task }: TaskFormProps) {
             />
           </div>
         </div>
+
+        <div className="border-t border-[hsl(var(--border))] pt-4">
+          <h4 className="mb-3 text-sm font-medium">Incremental Fetch</h4>
+          <div className="grid grid-cols-2 gap-4">
+            <Input
+              label="Date Column"
+              value={formData.incremental_date_column || ''}
+              onChange={(e) => handleChange('incremental_date_column', e.target.value)}
+              placeholder={'e.g. "Loan Details"."Loan Date"'}
+            />
+            <Input
+              label="Key Column"
+              value={formData.incremental_key_column || ''}
+              onChange={(e) => handleChange('incremental_key_column', e.target.value)}
+              placeholder="Output column heading"
+            />
+          </div>
+          <div className="mt-4">
+            <Input
+              label="Lookback Days"
+              type="number"
+              value={formData.incremental_lookback_days ?? 1}
+              onChange={(e) => handleChange('incremental_lookback_days', parseInt(e.target.value) || 0)}
+              min={0}
+            />
+          </div>
+        </div>
       </div>
     </Modal>
   );
@@ -1,3 +1,3 @@
 export { useTasks } from './useTasks';
-export { useJobs, useJobPolling } from './useJobs';
+export { useJobs, useJobStream } from './useJobs';
 export { useLogs } from './useLogs';
@@ -2,18 +2,23 @@ import { useState, useEffect, useCallback, useRef } from 'react';
 import { reportsApi } from '../api/client';
 import type { Job } from '../types';
 
-export function useJobs(autoRefresh = true, refreshInterval = 2000) {
+function mergeJob(jobs: Job[], job: Job): Job[] {
+  const index = jobs.findIndex((j) => j.id === job.id);
+  if (index === -1) {
+    return [job, ...jobs];
+  }
+  const next = [...jobs];
+  next[index] = job;
+  return next;
+}
+
+export function useJobs(autoRefresh = true) {
   const [jobs, setJobs] = useState<Job[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const intervalRef = useRef<number | null>(null);
-  const jobsRef = useRef<Job[]>([]);
   const mountedRef = useRef(true);
   const fetchingRef = useRef(false);
 
-  // Keep ref in sync with state to access latest value in interval callback
-  jobsRef.current = jobs;
-
   const fetchJobs = useCallback(async () => {
     // Prevent concurrent fetches
     if (fetchingRef.current || !mountedRef.current) {
@@ -43,34 +48,38 @@ export function useJobs(autoRefresh = true, refreshInterval = 2000) {
     mountedRef.current = true;
     fetchJobs();
 
-    if (autoRefresh) {
-      // Clear any existing interval first
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current);
-      }
-
-      intervalRef.current = window.setInterval(() => {
-        const hasActiveJobs = jobsRef.current.some(
-          (j) => j.status === 'pending' || j.status === 'running'
-        );
-        if (hasActiveJobs && mountedRef.current) {
-          fetchJobs();
-        }
-      }, refreshInterval);
+    if (!autoRefresh) {
+      return () => {
+        mountedRef.current = false;
+      };
     }
 
+    // The server pushes job changes instead of being polled; after a
+    // reconnect the list is reloaded to catch up on anything missed
+    const source = new EventSource(reportsApi.jobEventsUrl());
+    let connected = false;
+    source.onopen = () => {
+      if (connected) {
+        fetchJobs();
+      }
+      connected = true;
+    };
+    source.addEventListener('job', (e) => {
+      const job = JSON.parse((e as MessageEvent).data) as Job;
+      if (mountedRef.current) {
+        setJobs((prev) => mergeJob(prev, job));
+      }
+    });
+
     return () => {
       mountedRef.current = false;
-      if (intervalRef.current) {
-        clearInterval(intervalRef.current);
-        intervalRef.current = null;
-      }
+      source.close();
     };
-  }, [fetchJobs, autoRefresh, refreshInterval]);
+  }, [fetchJobs, autoRefresh]);
 
   const runReport = async (taskName: string, testMode: boolean) => {
     const job = await reportsApi.run(taskName, testMode);
-    setJobs((prev) => [job, ...prev]);
+    setJobs((prev) => mergeJob(prev, job));
     return job;
   };
 
@@ -89,7 +98,7 @@ export function useJobs(autoRefresh = true, refreshInterval = 2000) {
   };
 }
 
-export function useJobPolling(jobId: string | null, interval = 2000) {
+export function useJobStream(jobId: string | null) {
   const [job, setJob] = useState<Job | null>(null);
   const [loading, setLoading] = useState(false);
 
@@ -99,33 +108,20 @@ export function useJobPolling(jobId: string | null, interval = 2000) {
       return;
     }
 
-    let mounted = true;
-    let timeoutId: number;
-
-    const poll = async () => {
-      try {
-        setLoading(true);
-        const data = await reportsApi.getJob(jobId);
-        if (mounted) {
-          setJob(data);
-          if (data.status === 'pending' || data.status === 'running') {
-            timeoutId = window.setTimeout(poll, interval);
-          }
-        }
-      } catch {
-        if (mounted) setJob(null);
-      } finally {
-        if (mounted) setLoading(false);
+    setLoading(true);
+    // The stream starts with the job's current state, then sends its changes
+    const source = new EventSource(reportsApi.jobEventsUrl(jobId));
+    source.addEventListener('job', (e) => {
+      const data = JSON.parse((e as MessageEvent).data) as Job;
+      setJob(data);
+      setLoading(false);
+      if (data.status !== 'pending' && data.status !== 'running') {
+        source.close();
       }
-    };
+    });
 
-    poll();
-
-    return () => {
-      mounted = false;
-      if (timeoutId) clearTimeout(timeoutId);
-    };
-  }, [jobId, interval]);
+    return () => source.close();
+  }, [jobId]);
 
   return { job, loading };
 }
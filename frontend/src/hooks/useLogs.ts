@@ -1,4 +1,4 @@
-import { useState, useCallback, useRef } from 'react';
+import { useState, useCallback, useEffect, useRef } from 'react';
 import { logsApi } from '../api/client';
 import type { LogFile, LogContent } from '../types';
 
@@ -7,9 +7,19 @@ export function useLogs() {
   const [content, setContent] = useState<LogContent | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [following, setFollowing] = useState(false);
 
   // Track current fetch to prevent duplicate calls
   const currentFetchRef = useRef<string | null>(null);
+  const followRef = useRef<EventSource | null>(null);
+
+  const stopFollowing = useCallback(() => {
+    followRef.current?.close();
+    followRef.current = null;
+    setFollowing(false);
+  }, []);
+
+  useEffect(() => stopFollowing, [stopFollowing]);
 
   const fetchFiles = useCallback(async (taskName: string, testMode = false) => {
     const fetchKey = `${taskName}-${testMode}`;
@@ -41,6 +51,7 @@ export function useLogs() {
 
   const fetchContent = useCallback(
     async (taskName: string, filename: string, testMode = false) => {
+      stopFollowing();
       try {
         setLoading(true);
         setError(null);
@@ -53,18 +64,73 @@ export function useLogs() {
         setLoading(false);
       }
     },
-    []
+    [stopFollowing]
+  );
+
+  // Pages back through the log from the first line shown
+  const loadEarlier = useCallback(
+    async (taskName: string, testMode = false) => {
+      if (!content || content.start === 0) {
+        return;
+      }
+      try {
+        setError(null);
+        const data = await logsApi.readFile(taskName, content.name, testMode, 500, content.start);
+        setContent((prev) =>
+          prev && prev.name === data.name
+            ? { ...prev, content: data.content + prev.content, start: data.start }
+            : prev
+        );
+      } catch (err) {
+        setError(err instanceof Error ? err.message : 'Failed to read log file');
+      }
+    },
+    [content]
+  );
+
+  // Streams lines appended to the log after the last line shown
+  const follow = useCallback(
+    (taskName: string, testMode = false) => {
+      if (!content) {
+        return;
+      }
+      stopFollowing();
+      const source = new EventSource(logsApi.followUrl(taskName, content.name, testMode, content.end));
+      source.addEventListener('log', (e) => {
+        const event = e as MessageEvent;
+        const end = Number(event.lastEventId);
+        setContent((prev) =>
+          prev && { ...prev, content: prev.content + event.data + '\n', end, size: Math.max(prev.size, end) }
+        );
+      });
+      source.addEventListener('gone', stopFollowing);
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+          stopFollowing();
+        }
+      };
+      followRef.current = source;
+      setFollowing(true);
+    },
+    [content, stopFollowing]
   );
 
-  const clearContent = useCallback(() => setContent(null), []);
+  const clearContent = useCallback(() => {
+    stopFollowing();
+    setContent(null);
+  }, [stopFollowing]);
 
   return {
     files,
     content,
     loading,
     error,
+    following,
     fetchFiles,
     fetchContent,
+    loadEarlier,
+    follow,
+    stopFollowing,
     clearContent,
   };
 }
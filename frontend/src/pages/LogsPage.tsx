@@ -3,13 +3,25 @@ import { useSearchParams } from 'react-router-dom';
 import { Header } from '../components/layout/Header';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/Card';
 import { Select } from '../components/ui/Select';
-import { LogFileList, LogViewer } from '../components/logs';
+import { LogFileList, LogViewer, LogSearch } from '../components/logs';
 import { useTasks, useLogs } from '../hooks';
+import type { LogSearchHit } from '../types';
 
 export function LogsPage() {
   const [searchParams, setSearchParams] = useSearchParams();
   const { tasks, loading: tasksLoading } = useTasks();
-  const { files, content, loading, fetchFiles, fetchContent, clearContent } = useLogs();
+  const {
+    files,
+    content,
+    loading,
+    following,
+    fetchFiles,
+    fetchContent,
+    loadEarlier,
+    follow,
+    stopFollowing,
+    clearContent,
+  } = useLogs();
 
   const selectedTask = searchParams.get('task') || '';
   const [selectedFile, setSelectedFile] = useState<string | null>(null);
@@ -17,6 +29,8 @@ export function LogsPage() {
 
   // Track the last fetched combination to prevent duplicate fetches
   const lastFetchRef = useRef<string>('');
+  // File to open once another task's logs are loaded, from a search hit
+  const pendingFileRef = useRef<string | null>(null);
 
   const taskOptions = [
     { value: '', label: 'Select a task...' },
@@ -31,13 +45,20 @@ export function LogsPage() {
       if (lastFetchRef.current !== fetchKey) {
         lastFetchRef.current = fetchKey;
         fetchFiles(selectedTask, testMode);
-        setSelectedFile(null);
-        clearContent();
+        const pendingFile = pendingFileRef.current;
+        pendingFileRef.current = null;
+        if (pendingFile) {
+          setSelectedFile(pendingFile);
+          fetchContent(selectedTask, pendingFile, testMode);
+        } else {
+          setSelectedFile(null);
+          clearContent();
+        }
       }
     } else {
       lastFetchRef.current = '';
     }
-  }, [selectedTask, testMode, fetchFiles, clearContent]);
+  }, [selectedTask, testMode, fetchFiles, fetchContent, clearContent]);
 
   const handleTaskChange = (taskName: string) => {
     setSearchParams(taskName ? { task: taskName } : {});
@@ -50,6 +71,15 @@ export function LogsPage() {
     }
   };
 
+  const handleOpenHit = (hit: LogSearchHit) => {
+    if (hit.task === selectedTask) {
+      handleFileSelect(hit.name);
+      return;
+    }
+    pendingFileRef.current = hit.name;
+    handleTaskChange(hit.task);
+  };
+
   return (
     <div>
       <Header title="Logs" />
@@ -76,6 +106,12 @@ export function LogsPage() {
           </label>
         </div>
 
+        <Card className="mb-6">
+          <CardContent className="pt-6">
+            <LogSearch testMode={testMode} onOpen={handleOpenHit} />
+          </CardContent>
+        </Card>
+
         {!selectedTask ? (
           <Card>
             <CardContent className="py-12 text-center text-[hsl(var(--muted-foreground))]">
@@ -107,7 +143,19 @@ export function LogsPage() {
               </CardHeader>
               <CardContent>
                 {content ? (
-                  <LogViewer content={content.content} filename={content.name} />
+                  <LogViewer
+                    content={content.content}
+                    filename={content.name}
+                    hasEarlier={content.start > 0}
+                    onLoadEarlier={() => loadEarlier(selectedTask, testMode)}
+                    following={following}
+                    onToggleFollow={
+                      // Compressed logs are no longer written to
+                      content.name.endsWith('.gz')
+                        ? undefined
+                        : () => (following ? stopFollowing() : follow(selectedTask, testMode))
+                    }
+                  />
                 ) : (
                   <div className="py-12 text-center text-[hsl(var(--muted-foreground))]">
                     Select a log file to view its contents
@@ -3,13 +3,20 @@ export interface Task {
   alma_report_path: string;
   output_path: string;
   output_file_name: string;
-  output_format: string;
+  output_format: string | string[];
   log_dir: string;
   test_output_path?: string;
   test_log_dir?: string;
   test_row_limit: number;
   frequency?: 'daily' | 'weekly';
   active: boolean;
+  incremental_date_column?: string;
+  incremental_key_column?: string;
+  incremental_lookback_days?: number;
+  compression_level?: number;
+  priority?: number;
+  log_compress_after_days?: number;
+  log_delete_after_days?: number;
 }
 
 export interface TaskCreate {
@@ -17,26 +24,40 @@ export interface TaskCreate {
   alma_report_path: string;
   output_path: string;
   output_file_name: string;
-  output_format: string;
+  output_format: string | string[];
   log_dir: string;
   test_output_path?: string;
   test_log_dir?: string;
   test_row_limit: number;
   frequency?: 'daily' | 'weekly';
   active: boolean;
+  incremental_date_column?: string;
+  incremental_key_column?: string;
+  incremental_lookback_days?: number;
+  compression_level?: number;
+  priority?: number;
+  log_compress_after_days?: number;
+  log_delete_after_days?: number;
 }
 
 export interface TaskUpdate {
   alma_report_path: string;
   output_path: string;
   output_file_name: string;
-  output_format: string;
+  output_format: string | string[];
   log_dir: string;
   test_output_path?: string;
   test_log_dir?: string;
   test_row_limit: number;
   frequency?: 'daily' | 'weekly';
   active: boolean;
+  incremental_date_column?: string;
+  incremental_key_column?: string;
+  incremental_lookback_days?: number;
+  compression_level?: number;
+  priority?: number;
+  log_compress_after_days?: number;
+  log_delete_after_days?: number;
 }
 
 export type JobStatus = 'pending' | 'running' | 'completed' | 'failed' | 'cancelled';
@@ -61,7 +82,25 @@ export interface LogFile {
   modified: number;
 }
 
+export interface LogSearchHit {
+  task: string;
+  name: string;
+  test_mode: boolean;
+  line_number: number;
+  line: string;
+  modified: number;
+}
+
+export interface LogSearchResult {
+  hits: LogSearchHit[];
+  files_searched: number;
+  truncated: boolean;
+}
+
 export interface LogContent {
   content: string;
   name: string;
+  start: number;
+  end: number;
+  size: number;
 }